@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DealsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deals'
+
+    def ready(self):
+        import deals.signals
@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.db        import transaction
+from django.db.models import Min
+from django.utils     import timezone
+
+from deals.models           import Deal
+from deals.signals          import deal_status_changed
+from deals.utils            import bump_listing_version, close_platform_statistics
+from investments.models     import UserDeal, UserPayback
+from investments.schedules  import load_schedules
+from investments.statistics import move_deal_statistics
+
+ACTIVE_STATUSES = [
+    Deal.Status.NORMAL.value,
+    Deal.Status.DELAY.value,
+    Deal.Status.OVERDUE.value,
+    Deal.Status.NONPERFORM.value
+]
+DELINQUENCY_THRESHOLDS = [
+    (90, Deal.Status.NONPERFORM.value),
+    (30, Deal.Status.OVERDUE.value),
+    (0, Deal.Status.DELAY.value)
+]
+
+def classify(days_past_due):
+    for threshold, status in DELINQUENCY_THRESHOLDS:
+        if days_past_due > threshold:
+            return status
+
+    return Deal.Status.NORMAL.value
+
+def mark_unpaid_paybacks(today):
+    return UserPayback.objects.filter(
+        state            = UserPayback.State.TOBE_PAID.value,
+        payback_date__lt = today
+    ).update(state=UserPayback.State.UNPAID.value, updated_at=timezone.now())
+
+def oldest_unpaid_dates(deal_ids, today):
+    oldest = dict(
+        UserPayback.objects.filter(state=UserPayback.State.UNPAID.value, users_deals__deal_id__in=deal_ids)\
+            .values('users_deals__deal_id').annotate(oldest=Min('payback_date')).order_by()\
+            .values_list('users_deals__deal_id', 'oldest')
+    )
+
+    groups    = UserDeal.objects.filter(payback_mode=UserDeal.PaybackMode.DERIVED.value, deal_id__in=deal_ids)\
+        .values('deal_id', 'amount').annotate(paid_round=Min('paid_round')).order_by()
+    schedules = load_schedules((group['deal_id'], group['amount']) for group in groups)
+
+    for group in groups:
+        for schedule in schedules[(group['deal_id'], group['amount'])]:
+            if schedule.payback_round > group['paid_round']:
+                if schedule.payback_date < today and schedule.payback_date < oldest.get(group['deal_id'], today):
+                    oldest[group['deal_id']] = schedule.payback_date
+                break
+
+    return oldest
+
+def classify_deals(today=None):
+    today  = today or timezone.localdate()
+    marked = mark_unpaid_paybacks(today)
+    close_platform_statistics(today)
+    deals  = dict(Deal.objects.filter(status__in=ACTIVE_STATUSES).values_list('id', 'status'))
+    oldest = oldest_unpaid_dates(list(deals), today)
+
+    changes = defaultdict(list)
+    for deal_id, status in deals.items():
+        classified = classify((today - oldest[deal_id]).days) if deal_id in oldest else Deal.Status.NORMAL.value
+
+        if classified != status:
+            changes[classified].append(deal_id)
+
+    with transaction.atomic():
+        for status, deal_ids in changes.items():
+            Deal.objects.filter(id__in=deal_ids).update(status=status, updated_at=timezone.now())
+
+            for deal_id in deal_ids:
+                move_deal_statistics(deal_id, deals[deal_id], status)
+
+    if changes:
+        bump_listing_version()
+
+    for status, deal_ids in changes.items():
+        for deal_id in deal_ids:
+            deal_status_changed.send(sender=Deal, deal_id=deal_id, previous=deals[deal_id], status=status)
+
+    return marked, sum(len(deal_ids) for deal_ids in changes.values())
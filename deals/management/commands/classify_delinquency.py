@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from deals.delinquency import classify_deals
+
+class Command(BaseCommand):
+    help = 'Mark overdue paybacks as unpaid and move deals between NORMAL, DELAY, OVERDUE and NONPERFORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='classify as of this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        marked, changed = classify_deals(options['date'])
+
+        self.stdout.write(f'{marked} payback(s) marked unpaid, {changed} deal status change(s)')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from deals.utils import reconcile_deal_funding
+
+class Command(BaseCommand):
+    help = 'Recompute Deal.funded_amount and Deal.investor_count from users_deals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_deal_funding(options['deal_ids'])
+
+        self.stdout.write(f'{fixed} deal(s) reconciled')
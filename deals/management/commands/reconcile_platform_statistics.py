@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from deals.utils import reconcile_platform_statistics
+
+class Command(BaseCommand):
+    help = 'Recompute the platform statistics row behind LoanAmountView'
+
+    def handle(self, *args, **options):
+        statistics = reconcile_platform_statistics()
+
+        self.stdout.write(
+            f'loan_amount={statistics.loan_amount} invested_amount={statistics.invested_amount} '
+            f'investment_count={statistics.investment_count} user_count={statistics.user_count}'
+        )
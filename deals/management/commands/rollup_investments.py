@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from deals.rollups import rollup_investments
+
+class Command(BaseCommand):
+    help = 'Fill the daily and monthly investment rollups from the last watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='recompute from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start, buckets = rollup_investments(options['since'])
+
+        self.stdout.write(f'{buckets} bucket(s) rolled up since {start}')
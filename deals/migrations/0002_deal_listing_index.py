@@ -0,0 +1,17 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['category', 'start_date', 'id'], name='deals_category_start_idx'),
+        ),
+    ]
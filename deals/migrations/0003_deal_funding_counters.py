@@ -0,0 +1,39 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_funding(apps, schema_editor):
+    Deal     = apps.get_model('deals', 'Deal')
+    UserDeal = apps.get_model('investments', 'UserDeal')
+
+    funding = UserDeal.objects.filter(deal=OuterRef('pk')).order_by().values('deal')
+
+    Deal.objects.update(
+        funded_amount  = Coalesce(Subquery(funding.annotate(total=Sum('amount')).values('total')), 0),
+        investor_count = Coalesce(Subquery(funding.annotate(total=Count('id')).values('total')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0002_deal_listing_index'),
+        ('investments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='funded_amount',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deal',
+            name='investor_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_funding, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0003_deal_funding_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='mortgageimage',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='mortgageimage',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='mortgageimage',
+            index=models.Index(fields=['mortgage', 'position'], name='mortgage_images_position_idx'),
+        ),
+    ]
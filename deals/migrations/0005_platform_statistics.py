@@ -0,0 +1,29 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0004_mortgage_image_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('loan_amount', models.BigIntegerField(default=0)),
+                ('invested_amount', models.BigIntegerField(default=0)),
+                ('investment_count', models.IntegerField(default=0)),
+                ('user_count', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'platform_statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0005_platform_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.IntegerField(choices=[(1, '일별'), (2, '월별')])),
+                ('date', models.DateField()),
+                ('invested_amount', models.BigIntegerField(default=0)),
+                ('investment_count', models.IntegerField(default=0)),
+                ('repaid_principal', models.BigIntegerField(default=0)),
+                ('investor_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'investment_rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('watermark', models.DateField()),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='investmentrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'date'), name='unique_rollup_period_date'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db                  import migrations
+from django.db.models           import Count, Sum, Q
+from django.db.models.functions import Coalesce
+from django.utils               import timezone
+
+STATISTICS_ID = 1
+
+def seed_platform_statistics(apps, schema_editor):
+    PlatformStatistics = apps.get_model('deals', 'PlatformStatistics')
+    UserDeal           = apps.get_model('investments', 'UserDeal')
+    User               = apps.get_model('users', 'User')
+
+    investments = UserDeal.objects.aggregate(
+        loan_amount      = Coalesce(Sum('amount', filter=Q(deal__end_date__lt=timezone.localdate())), 0),
+        invested_amount  = Coalesce(Sum('amount'), 0),
+        investment_count = Count('id')
+    )
+
+    PlatformStatistics.objects.get_or_create(
+        id       = STATISTICS_ID,
+        defaults = dict(investments, user_count=User.objects.count(), reconciled_at=timezone.now())
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0006_investment_rollups'),
+        ('investments', '0002_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_platform_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0007_seed_platform_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='schedule_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
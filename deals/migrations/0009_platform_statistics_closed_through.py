@@ -0,0 +1,28 @@
+# Generated by Django 3.2.5 on 2026-10-18 08:05
+
+from django.db    import migrations, models
+from django.utils import timezone
+
+
+def backfill_closed_through(apps, schema_editor):
+    PlatformStatistics = apps.get_model('deals', 'PlatformStatistics')
+
+    for statistics in PlatformStatistics.objects.all():
+        statistics.closed_through = timezone.localdate(statistics.reconciled_at)
+        statistics.save(update_fields=['closed_through'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0008_deal_schedule_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='platformstatistics',
+            name='closed_through',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_closed_through, migrations.RunPython.noop),
+    ]
@@ -54,9 +54,15 @@ class Deal(TimeStampModel):
     reason           = models.CharField(max_length=100)
     debtor           = models.ForeignKey('Debtor', on_delete=models.PROTECT)
     status           = models.IntegerField(choices=Status.choices)
+    funded_amount    = models.IntegerField(default=0)
+    investor_count   = models.IntegerField(default=0)
+    schedule_version = models.IntegerField(default=0)
 
     class Meta:
         db_table = 'deals'
+        indexes  = [
+            models.Index(fields=['category', 'start_date', 'id'], name='deals_category_start_idx')
+        ]
 
 class Debtor(TimeStampModel):
     name       = models.CharField(max_length=100)
@@ -96,6 +102,47 @@ class Mortgage(TimeStampModel):
 class MortgageImage(models.Model):
     mortgage  = models.ForeignKey('Mortgage', on_delete=models.CASCADE)
     image_url = models.CharField(max_length=500)
+    position  = models.PositiveIntegerField(default=0)
 
     class Meta:
-        db_table = 'mortgage_images'
\ No newline at end of file
+        db_table = 'mortgage_images'
+        ordering = ['position', 'id']
+        indexes  = [
+            models.Index(fields=['mortgage', 'position'], name='mortgage_images_position_idx')
+        ]
+
+class PlatformStatistics(TimeStampModel):
+    loan_amount      = models.BigIntegerField(default=0)
+    invested_amount  = models.BigIntegerField(default=0)
+    investment_count = models.IntegerField(default=0)
+    user_count       = models.IntegerField(default=0)
+    closed_through   = models.DateField(null=True)
+    reconciled_at    = models.DateTimeField()
+
+    class Meta:
+        db_table = 'platform_statistics'
+
+class InvestmentRollup(models.Model):
+    class Period(models.IntegerChoices):
+        DAY   = 1, '일별'
+        MONTH = 2, '월별'
+
+    period           = models.IntegerField(choices=Period.choices)
+    date             = models.DateField()
+    invested_amount  = models.BigIntegerField(default=0)
+    investment_count = models.IntegerField(default=0)
+    repaid_principal = models.BigIntegerField(default=0)
+    investor_count   = models.IntegerField(default=0)
+
+    class Meta:
+        db_table    = 'investment_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'date'], name='unique_rollup_period_date')
+        ]
+
+class RollupWatermark(TimeStampModel):
+    name      = models.CharField(max_length=50, unique=True)
+    watermark = models.DateField()
+
+    class Meta:
+        db_table = 'rollup_watermarks'
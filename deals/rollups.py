@@ -0,0 +1,105 @@
+from collections import Counter, defaultdict
+from datetime    import datetime, time
+
+from django.db                  import transaction
+from django.db.models           import Q, Sum, Count, Min, F, DateField
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils               import timezone
+
+from deals.models          import InvestmentRollup, RollupWatermark
+from investments.models    import UserDeal, UserPayback, UnitSchedule, PaybackSchedule
+from investments.schedules import load_schedules
+
+WATERMARK_NAME = 'investment_rollups'
+
+def lower_rollup_watermark(date):
+    RollupWatermark.objects.filter(name=WATERMARK_NAME, watermark__gt=date).update(watermark=date)
+
+def derived_repayments(start, end):
+    first_rounds = {}
+    for model in [UnitSchedule, PaybackSchedule]:
+        for deal_id, payback_round in model.objects.filter(payback_date__range=(start, end))\
+                .values_list('deal_id', 'payback_round').order_by():
+            first_rounds[deal_id] = min(payback_round, first_rounds.get(deal_id, payback_round))
+
+    if not first_rounds:
+        return {}
+
+    due = Q()
+    for deal_id, first_round in first_rounds.items():
+        due |= Q(deal_id=deal_id, paid_round__gte=first_round)
+
+    derived    = UserDeal.objects.filter(due, payback_mode=UserDeal.PaybackMode.DERIVED.value)
+    groups     = list(derived.values('deal_id', 'amount', 'paid_round').annotate(holders=Count('id')).order_by())
+    overridden = Counter(
+        UserPayback.objects.filter(
+            users_deals__in    = derived,
+            payback_round__gte = min(first_rounds.values()),
+            payback_round__lte = F('users_deals__paid_round')
+        ).values_list('users_deals__deal_id', 'users_deals__amount', 'users_deals__paid_round', 'payback_round')
+    )
+    schedules  = load_schedules((group['deal_id'], group['amount']) for group in groups)
+
+    repaid = defaultdict(int)
+    for group in groups:
+        for schedule in schedules[(group['deal_id'], group['amount'])]:
+            if schedule.payback_round > group['paid_round'] or not start <= schedule.payback_date <= end:
+                continue
+
+            holders = group['holders'] - overridden[(group['deal_id'], group['amount'], group['paid_round'], schedule.payback_round)]
+            repaid[schedule.payback_date] += schedule.principal * holders
+
+    return repaid
+
+def rollup_investments(since=None):
+    today = timezone.localdate()
+
+    if not since:
+        since = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('watermark', flat=True).first()
+
+    if not since:
+        first_day = UserDeal.objects.aggregate(first_day=Min('created_at'))['first_day']
+        since     = timezone.localdate(first_day) if first_day else today
+
+    start    = since.replace(day=1)
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+
+    investments = UserDeal.objects.filter(created_at__gte=start_at).order_by()
+    paybacks    = UserPayback.objects.filter(
+        state             = UserPayback.State.PAID.value,
+        payback_date__gte = start,
+        payback_date__lte = today
+    ).order_by()
+
+    derived = derived_repayments(start, today)
+
+    buckets = {}
+    for period, truncate, payback_truncate in [
+        (InvestmentRollup.Period.DAY.value, TruncDate('created_at'), F('payback_date')),
+        (InvestmentRollup.Period.MONTH.value, TruncMonth('created_at', output_field=DateField()), TruncMonth('payback_date'))
+    ]:
+        for row in investments.annotate(bucket=truncate).values('bucket').annotate(
+            invested_amount  = Sum('amount'),
+            investment_count = Count('id'),
+            investor_count   = Count('user', distinct=True)
+        ):
+            rollup = buckets.setdefault((period, row['bucket']), InvestmentRollup(period=period, date=row['bucket']))
+            rollup.invested_amount  = row['invested_amount']
+            rollup.investment_count = row['investment_count']
+            rollup.investor_count   = row['investor_count']
+
+        for row in paybacks.annotate(bucket=payback_truncate).values('bucket').annotate(repaid_principal=Sum('principal')):
+            rollup = buckets.setdefault((period, row['bucket']), InvestmentRollup(period=period, date=row['bucket']))
+            rollup.repaid_principal += row['repaid_principal']
+
+        for payback_date, repaid_principal in derived.items():
+            bucket = payback_date if period == InvestmentRollup.Period.DAY else payback_date.replace(day=1)
+            rollup = buckets.setdefault((period, bucket), InvestmentRollup(period=period, date=bucket))
+            rollup.repaid_principal += repaid_principal
+
+    with transaction.atomic():
+        InvestmentRollup.objects.filter(date__gte=start).delete()
+        InvestmentRollup.objects.bulk_create(buckets.values(), batch_size=1000)
+        RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'watermark': today})
+
+    return start, len(buckets)
@@ -0,0 +1,33 @@
+from django.db                import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch          import receiver, Signal
+from django.utils             import timezone
+
+from deals.models import Deal, Mortgage, MortgageImage, CreditScore
+from deals.utils  import bump_listing_version
+
+deal_status_changed = Signal()
+
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+@receiver(post_save, sender=Mortgage)
+@receiver(post_delete, sender=Mortgage)
+@receiver(post_save, sender=MortgageImage)
+@receiver(post_delete, sender=MortgageImage)
+def expire_deal_listing(sender, **kwargs):
+    transaction.on_commit(bump_listing_version)
+
+@receiver(post_save, sender=Mortgage)
+@receiver(post_delete, sender=Mortgage)
+def touch_mortgage_deal(sender, instance, **kwargs):
+    Deal.objects.filter(id=instance.deal_id).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=MortgageImage)
+@receiver(post_delete, sender=MortgageImage)
+def touch_mortgage_image_deal(sender, instance, **kwargs):
+    Deal.objects.filter(mortgage__id=instance.mortgage_id).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=CreditScore)
+@receiver(post_delete, sender=CreditScore)
+def touch_debtor_deals(sender, instance, **kwargs):
+    Deal.objects.filter(debtor_id=instance.debtor_id).update(updated_at=timezone.now())
@@ -1,17 +1,25 @@
-import bcrypt, jwt
+import bcrypt, jwt, warnings
+from io       import StringIO
 from datetime import datetime, timedelta
 
-from django.test  import TestCase, Client
+from django.test             import TestCase, Client
+from django.db.models        import Sum
+from django.core.management  import call_command
+from django.utils            import timezone
+from django.core.cache       import CacheKeyWarning
 
 from my_settings        import SECRET_KEY, ALGORITHM
 from users.models       import Bank, User
-from investments.models import UserDeal, UserPayback
+from investments.models import UserDeal, UserPayback, PaybackSchedule, UserInvestmentStatistics
+from deals.delinquency  import classify_deals
+from deals.signals      import deal_status_changed
 from deals.models       import (
     Deal, 
     Debtor,
     MortgageImage, 
     Mortgage,
-    CreditScore
+    CreditScore,
+    PlatformStatistics
 )
 
 class DealDetailViewTestCase(TestCase):
@@ -168,6 +176,45 @@ class DealDetailViewTestCase(TestCase):
         }
     )
 
+    def test_deal_detail_cached_document(self):
+        client = Client()
+        client.get('/deals/1')
+
+        with self.assertNumQueries(1):
+            response = client.get('/deals/1')
+
+        self.assertEqual(response.json()['mortgageInfo']['mortgageImage'], ['https://naver.com'])
+
+        MortgageImage.objects.create(mortgage_id=1, image_url='https://daum.net')
+        response = client.get('/deals/1')
+
+        self.assertEqual(response.json()['mortgageInfo']['mortgageImage'], ['https://naver.com', 'https://daum.net'])
+
+    def test_deal_batch_success(self):
+        client   = Client()
+        response = client.get('/deals/batch?ids=2,1,133')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+            {
+                "results": [
+                    dict(id=2, **client.get('/deals/2').json()),
+                    dict(id=1, **client.get('/deals/1').json())
+                ]
+            }
+        )
+
+    def test_deal_batch_invalid_input(self):
+        client   = Client()
+        response = client.get('/deals/batch?ids=' + ','.join(str(i) for i in range(1, 22)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(),
+            {
+                'message':'INVALID_INPUT'
+            }
+        )
+
     def test_deal_detail_get_invaild_error(self):
         client   = Client()
         response = client.get('/deals/133')
@@ -828,6 +875,72 @@ class DealTest(TestCase):
             }
         )
 
+    def test_closed_mortgage_dealview_cursor_get_success(self):
+        client   = Client()
+        response = client.get('/deals?category=mortgage&closed=true&limit=50')
+        expected = [result['index'] for result in response.json()['results']]
+
+        indexes = []
+        cursor  = ''
+        while cursor is not None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', CacheKeyWarning)
+                response = client.get('/deals', {'category': 'mortgage', 'closed': 'true', 'limit': 2, 'cursor': cursor})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()['results']), 2)
+
+            indexes += [result['index'] for result in response.json()['results']]
+            cursor   = response.json()['nextCursor']
+
+        self.assertEqual(indexes, expected)
+
+    def test_closed_mortgage_dealview_cover_image(self):
+        image          = MortgageImage.objects.get(id=5)
+        image.position = 1
+        image.save()
+
+        client   = Client()
+        response = client.get('/deals?category=mortgage&closed=true&limit=50')
+        results  = {result['index']: result for result in response.json()['results']}
+
+        self.assertEqual(results[3]['titleImage'], 'www.naver5.com')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MortgageImage.objects.filter(mortgage_id=3).delete()
+        response = client.get('/deals?category=mortgage&closed=true&limit=50')
+        results  = {result['index']: result for result in response.json()['results']}
+
+        self.assertEqual(results[3]['titleImage'], None)
+
+    def test_closed_mortgage_dealview_listing_cache(self):
+        client = Client()
+        client.get('/deals?category=mortgage&closed=true')
+
+        with self.assertNumQueries(0):
+            response = client.get('/deals?category=mortgage&closed=true')
+        results = {result['index']: result for result in response.json()['results']}
+
+        self.assertEqual(results[3]['investmentAmount'], 9000000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserDeal.objects.get(id=5).delete()
+        response = client.get('/deals?category=mortgage&closed=true')
+        results  = {result['index']: result for result in response.json()['results']}
+
+        self.assertEqual(results[3]['investmentAmount'], 0)
+
+    def test_dealview_get_invalid_cursor(self):
+        client   = Client()
+        response = client.get('/deals?category=mortgage&closed=true&cursor=invalid')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(),
+            {
+                'message':'VALUE_ERROR'
+            }
+        )
+
 class LoanAmountTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -1039,3 +1152,271 @@ class LoanAmountTestCase(TestCase):
                 }
             }
         )
+
+    def test_loan_amount_counters_follow_investments(self):
+        call_command('reconcile_platform_statistics', stdout=StringIO())
+
+        client = Client()
+
+        User.objects.create(id=2, email='investor@gmail.com', deposit_bank_id=1, deposit_account='12344568')
+        UserDeal.objects.create(user_id=2, deal_id=4, amount=200000)
+
+        with self.assertNumQueries(1):
+            response = client.get('/deals/loan-amount')
+
+        self.assertEqual(response.json()['result']['investAcc'], 11)
+        self.assertEqual(response.json()['result']['avgPerPerson'], 4000000)
+        self.assertIn('stale-while-revalidate', response['Cache-Control'])
+
+    def test_loan_amount_follows_closed_deals(self):
+        PlatformStatistics.objects.filter(id=1).update(loan_amount=0, closed_through='2000-01-01')
+
+        classify_deals()
+        response = Client().get('/deals/loan-amount')
+
+        self.assertEqual(response.json()['result']['loanAcc'], 7800000)
+        self.assertEqual(PlatformStatistics.objects.get(id=1).closed_through, timezone.localdate())
+
+    def test_loan_amount_serves_stale_row(self):
+        PlatformStatistics.objects.filter(id=1).update(
+            investment_count = 3,
+            reconciled_at    = timezone.now() - timedelta(days=1)
+        )
+
+        with self.assertNumQueries(1):
+            response = Client().get('/deals/loan-amount')
+
+        self.assertEqual(response.json()['result']['investAcc'], 3)
+
+    def test_loan_amount_history_month_success(self):
+        call_command('rollup_investments', '--since=2019-01-01', stdout=StringIO())
+
+        client   = Client()
+        response = client.get('/deals/loan-amount/history?period=month&start=2019-01-01')
+        results  = response.json()['results']
+        repaid   = UserPayback.objects.filter(
+            state             = UserPayback.State.PAID.value,
+            payback_date__lte = datetime.today().date()
+        ).aggregate(Sum('principal'))['principal__sum']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(results[-1]['loanAcc'], 7800000)
+        self.assertEqual(results[-1]['investAcc'], 10)
+        self.assertEqual(results[-1]['repaidAcc'], repaid)
+        self.assertEqual(sum(result['investorCount'] for result in results), 1)
+
+    def test_loan_amount_history_invalid_input(self):
+        client   = Client()
+        response = client.get('/deals/loan-amount/history?period=year')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message':'INVALID_INPUT'})
+
+class DealFundingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Bank.objects.create(
+            id   = 1,
+            name = '신한은행'
+        )
+
+        for i in range(1, 3):
+            User.objects.create(
+                id              = i,
+                email           = f'tester{i}@gmail.com',
+                deposit_bank_id = 1,
+                deposit_account = f'1020230943293{i}'
+            )
+
+        Debtor.objects.create(
+            id         = 1,
+            name       = 'tester',
+            birth_date = '2020-01-01'
+        )
+
+        Deal.objects.create(
+            id               = 1,
+            name             = '송도아파트',
+            category         = 1,
+            grade            = 2,
+            earning_rate     = 8.14,
+            interest_rate    = 3.24,
+            repayment_period = 12,
+            repayment_method = 1,
+            net_amount       = 9000000,
+            repayment_day    = 25,
+            start_date       = '2021-06-30',
+            end_date         = '2021-07-30',
+            reason           = '아이스크림',
+            debtor_id        = 1,
+            status           = 1
+        )
+
+        UserDeal.objects.create(user_id=1, deal_id=1, amount=900000)
+        UserDeal.objects.create(user_id=2, deal_id=1, amount=100000)
+
+    def test_deal_funding_counters_follow_user_deals(self):
+        deal = Deal.objects.get(id=1)
+
+        self.assertEqual(deal.funded_amount, 1000000)
+        self.assertEqual(deal.investor_count, 2)
+
+        UserDeal.objects.get(user_id=2, deal_id=1).delete()
+        deal.refresh_from_db()
+
+        self.assertEqual(deal.funded_amount, 900000)
+        self.assertEqual(deal.investor_count, 1)
+
+    def test_reconcile_deal_funding_command(self):
+        Deal.objects.filter(id=1).update(funded_amount=0, investor_count=0)
+
+        call_command('reconcile_deal_funding', stdout=StringIO())
+        deal = Deal.objects.get(id=1)
+
+        self.assertEqual(deal.funded_amount, 1000000)
+        self.assertEqual(deal.investor_count, 2)
+
+class DealPaybackTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Debtor.objects.create(
+            id         = 1,
+            name       = 'tester',
+            birth_date = '2020-01-01'
+        )
+
+        deal = Deal.objects.create(
+            id               = 1,
+            name             = '송도아파트',
+            category         = 1,
+            grade            = 2,
+            earning_rate     = 8.14,
+            interest_rate    = 3.24,
+            repayment_period = 2,
+            repayment_method = 3,
+            net_amount       = 9000000,
+            repayment_day    = 25,
+            start_date       = '2021-06-30',
+            end_date         = '2021-07-30',
+            reason           = '아이스크림',
+            debtor_id        = 1,
+            status           = 1
+        )
+
+        for option in [5000, 10000]:
+            for payback_round in [1, 2]:
+                PaybackSchedule.objects.create(
+                    deal          = deal,
+                    option        = option,
+                    principal     = 0 if payback_round == 1 else option,
+                    interest      = option // 100,
+                    tax           = option // 1000,
+                    commission    = option // 2000,
+                    payback_round = payback_round,
+                    payback_date  = f'2021-0{payback_round + 7}-25'
+                )
+
+    def test_deal_payback_view_success(self):
+        client = Client()
+        client.get('/deals/1/payback')
+
+        with self.assertNumQueries(1):
+            response = client.get('/deals/1/payback')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+            {
+                'results': {
+                    'deposit'    : None,
+                    'invested'   : False,
+                    'status'     : 'APPLYING',
+                    'investCount': 0,
+                    'options'    : {
+                        '5000' : {'realityPrice': 5086, 'tax': 10, 'interest': 100, 'commission': 4},
+                        '10000': {'realityPrice': 10170, 'tax': 20, 'interest': 200, 'commission': 10}
+                    }
+                }
+            }
+        )
+
+class DelinquencyTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Bank.objects.create(id=1, name='농협은행')
+        User.objects.create(id=1, email='example@gmail.com', deposit_bank_id=1, deposit_account='12344567')
+        Debtor.objects.create(id=1, name='tester', birth_date='2020-01-01')
+
+        deal = Deal.objects.create(
+            id               = 1,
+            name             = '송도아파트',
+            category         = 1,
+            grade            = 2,
+            earning_rate     = 8.14,
+            interest_rate    = 3.24,
+            repayment_period = 3,
+            repayment_method = 3,
+            net_amount       = 9000000,
+            repayment_day    = 25,
+            start_date       = '2021-03-01',
+            end_date         = '2021-04-01',
+            reason           = '아이스크림',
+            debtor_id        = 1,
+            status           = Deal.Status.NORMAL.value
+        )
+        user_deal = UserDeal.objects.create(user_id=1, deal=deal, amount=5000)
+
+        for payback_round, payback_date in enumerate(['2021-05-25', '2021-06-25', '2021-07-25'], 1):
+            UserPayback.objects.create(
+                users_deals   = user_deal,
+                principal     = 0 if payback_round < 3 else 5000,
+                interest      = 13,
+                tax           = 0,
+                commission    = 1,
+                payback_round = payback_round,
+                state         = UserPayback.State.TOBE_PAID.value,
+                payback_date  = payback_date
+            )
+
+    def test_classify_deals_success(self):
+        changes = []
+        def record(sender, deal_id, previous, status, **kwargs):
+            changes.append((deal_id, previous, status))
+
+        deal_status_changed.connect(record)
+        try:
+            self.assertEqual(classify_deals(datetime(2021, 7, 28).date()), (3, 1))
+            self.assertEqual(classify_deals(datetime(2021, 7, 28).date()), (0, 0))
+
+            UserPayback.objects.filter(payback_round__lte=2).update(state=UserPayback.State.PAID.value)
+            self.assertEqual(classify_deals(datetime(2021, 7, 28).date()), (0, 1))
+
+        finally:
+            deal_status_changed.disconnect(record)
+
+        self.assertEqual(changes, [
+            (1, Deal.Status.NORMAL.value, Deal.Status.OVERDUE.value),
+            (1, Deal.Status.OVERDUE.value, Deal.Status.DELAY.value)
+        ])
+        self.assertEqual(
+            list(UserPayback.objects.order_by('payback_round').values_list('state', flat=True)),
+            [UserPayback.State.PAID.value, UserPayback.State.PAID.value, UserPayback.State.UNPAID.value]
+        )
+
+    def test_classify_deals_moves_statistics(self):
+        classify_deals(datetime(2021, 7, 28).date())
+
+        self.assertEqual(
+            list(UserInvestmentStatistics.objects.filter(user_id=1, total_amount__gt=0).values_list('status', flat=True)),
+            [Deal.Status.OVERDUE.value]
+        )
+        self.assertEqual(
+            UserInvestmentStatistics.objects.filter(user_id=1, status=Deal.Status.NORMAL.value)\
+                .values_list('total_amount', 'total_interest', 'mortgage_outstanding').get(),
+            (0, 0, 0)
+        )
+        self.assertEqual(
+            UserInvestmentStatistics.objects.filter(user_id=1, status=Deal.Status.OVERDUE.value)\
+                .values_list('total_amount', 'total_interest', 'mortgage_outstanding').get(),
+            (5000, 39, 5000)
+        )
+
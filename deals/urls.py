@@ -1,11 +1,13 @@
 from django.db.models.expressions import F
 from django.urls import path
 
-from deals.views import DealDetailView, DealsView, LoanAmountView, DealPaybackView
+from deals.views import DealDetailView, DealsView, LoanAmountView, LoanAmountHistoryView, DealPaybackView, DealBatchView
 
 urlpatterns = [
     path(''                      , DealsView.as_view()),
+    path('/batch'                , DealBatchView.as_view()),
     path('/<int:deal_id>'        , DealDetailView.as_view()),
     path('/loan-amount'          , LoanAmountView.as_view()),
+    path('/loan-amount/history'  , LoanAmountHistoryView.as_view()),
     path('/<int:deal_id>/payback', DealPaybackView.as_view()),
 ]
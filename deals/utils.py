@@ -0,0 +1,179 @@
+import time
+import base64
+
+from datetime import date
+
+from django.core.cache          import cache
+from django.db                  import transaction
+from django.utils               import timezone
+from django.db.models           import Count, OuterRef, Subquery, Sum, Q, F, Prefetch
+from django.db.models.functions import Coalesce
+
+from deals.models       import Deal, Mortgage, MortgageImage, PlatformStatistics
+from investments.models import UserDeal
+from users.models       import User
+
+LISTING_VERSION_KEY = 'deals:listing:version'
+DETAIL_TIMEOUT      = 60 * 60 * 24
+STATISTICS_ID       = 1
+
+def encode_cursor(deal):
+    cursor = f'{deal.start_date.isoformat()}|{deal.id}'
+
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('utf-8')
+
+def decode_cursor(cursor):
+    start_date, deal_id = base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8').split('|')
+
+    return date.fromisoformat(start_date), int(deal_id)
+
+def cover_image():
+    return Subquery(
+        MortgageImage.objects.filter(mortgage__deal=OuterRef('pk'))\
+            .order_by('mortgage_id', 'position', 'id').values('image_url')[:1]
+    )
+
+def listing_version():
+    return cache.get_or_set(LISTING_VERSION_KEY, time.time_ns, None)
+
+def bump_listing_version():
+    try:
+        return cache.incr(LISTING_VERSION_KEY)
+
+    except ValueError:
+        return listing_version()
+
+def add_deal_funding(deal_id, amount, investors=1):
+    updated = Deal.objects.filter(id=deal_id).update(
+        funded_amount  = F('funded_amount') + amount,
+        investor_count = F('investor_count') + investors
+    )
+    transaction.on_commit(bump_listing_version)
+
+    return updated
+
+def reconcile_deal_funding(deal_ids=None):
+    funding = UserDeal.objects.filter(deal=OuterRef('pk')).order_by().values('deal')
+    deals   = Deal.objects.annotate(
+        actual_amount = Coalesce(Subquery(funding.annotate(total=Sum('amount')).values('total')), 0),
+        actual_count  = Coalesce(Subquery(funding.annotate(total=Count('id')).values('total')), 0)
+    ).filter(~Q(funded_amount=F('actual_amount')) | ~Q(investor_count=F('actual_count')))
+
+    if deal_ids:
+        deals = deals.filter(id__in=deal_ids)
+
+    drifted = []
+    for deal in deals.only('id'):
+        deal.funded_amount  = deal.actual_amount
+        deal.investor_count = deal.actual_count
+        drifted.append(deal)
+
+    Deal.objects.bulk_update(drifted, ['funded_amount', 'investor_count'], batch_size=1000)
+
+    if drifted:
+        bump_listing_version()
+
+    return len(drifted)
+
+def detail_queryset():
+    return Deal.objects.select_related('debtor').prefetch_related(
+        'debtor__creditscore_set',
+        Prefetch('mortgage_set', queryset=Mortgage.objects.prefetch_related('mortgageimage_set'), to_attr='mortgages')
+    )
+
+def detail_cache_key(deal_id, updated_at):
+    return f'deals:{deal_id}:detail:{updated_at.timestamp()}'
+
+def serialize_deal_detail(deal):
+    document = {
+        "dealInfo": {
+            "name"            : deal.name,
+            "category"        : Deal.Category(deal.category).label,
+            "grade"           : Deal.Grade(deal.grade).label,
+            "earningRate"     : deal.earning_rate,
+            "repaymentPeriod" : deal.repayment_period,
+            "repaymentMethod" : Deal.RepaymentMethod(deal.repayment_method).label,
+            "netAmount"       : deal.net_amount,
+            "repaymentDay"    : deal.repayment_day,
+            "reason"          : deal.reason,
+            "debtor"          : deal.debtor.name,
+            "creditScore"     : [score.score for score in deal.debtor.creditscore_set.all()]
+        }
+    }
+
+    if deal.category == Deal.Category.MORTGAGE.value and deal.mortgages:
+        mortgage = deal.mortgages[0]
+        document["mortgageInfo"] = {
+            "latitude"               : mortgage.latitude,
+            "longitude"              : mortgage.longitude,
+            "estimatedRecovery"      : mortgage.estimated_recovery,
+            "appraisedValue"         : mortgage.appraised_value,
+            "seniorLoanAmount"       : mortgage.senior_loan_amount,
+            "address"                : mortgage.address,
+            "completedDate"          : mortgage.completed_date,
+            "scale"                  : mortgage.scale,
+            "supplyArea"             : mortgage.supply_area,
+            "usingArea"              : mortgage.using_area,
+            "floor"                  : mortgage.floors,
+            "isUsage"                : mortgage.is_usage,
+            "sellingPointTitle"      : mortgage.selling_point_title,
+            "sellingPointDescription": mortgage.selling_point_description,
+            "mortgageImage"          : [image.image_url for image in mortgage.mortgageimage_set.all()],
+            "collateralReserve"      : mortgage.appraised_value - (mortgage.senior_loan_amount+deal.net_amount)
+        }
+
+    return document
+
+def merge_deal_funding(document, funded_amount, net_amount):
+    deal_info = dict(
+        document["dealInfo"],
+        amount           = funded_amount,
+        amountPercentage = int(funded_amount/net_amount)*100
+    )
+
+    return dict(document, dealInfo=deal_info)
+
+def add_platform_statistics(**deltas):
+    return PlatformStatistics.objects.filter(id=STATISTICS_ID).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+def add_loan_amount(deal_id, amount):
+    return PlatformStatistics.objects.filter(
+        id                 = STATISTICS_ID,
+        closed_through__gt = Subquery(Deal.objects.filter(id=deal_id).values('end_date'))
+    ).update(loan_amount=F('loan_amount') + amount)
+
+def close_platform_statistics(today):
+    with transaction.atomic():
+        statistics = PlatformStatistics.objects.select_for_update().filter(id=STATISTICS_ID).first()
+
+        if not statistics or not statistics.closed_through or statistics.closed_through >= today:
+            return 0
+
+        closed = UserDeal.objects.filter(
+            deal__end_date__gte = statistics.closed_through,
+            deal__end_date__lt  = today
+        ).aggregate(total=Coalesce(Sum('amount'), 0))['total']
+
+        PlatformStatistics.objects.filter(id=STATISTICS_ID).update(
+            loan_amount    = F('loan_amount') + closed,
+            closed_through = today
+        )
+
+    return closed
+
+def reconcile_platform_statistics():
+    today       = timezone.localdate()
+    investments = UserDeal.objects.aggregate(
+        loan_amount      = Coalesce(Sum('amount', filter=Q(deal__end_date__lt=today)), 0),
+        invested_amount  = Coalesce(Sum('amount'), 0),
+        investment_count = Count('id')
+    )
+
+    statistics, _ = PlatformStatistics.objects.update_or_create(
+        id       = STATISTICS_ID,
+        defaults = dict(investments, user_count=User.objects.count(), closed_through=today, reconciled_at=timezone.now())
+    )
+
+    return statistics
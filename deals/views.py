@@ -1,72 +1,106 @@
 import math
 
-from django.db.models import Sum, Prefetch, Q, F, Sum
-from django.views     import View
-from django.http      import JsonResponse
-from django.utils     import timezone
+from datetime import date
+
+from django.db.models           import Q, F, Sum
+from django.db.models.functions import Coalesce
+from django.views               import View
+from django.http                import JsonResponse
+from django.utils               import timezone
+from django.core.cache          import cache
 
 from users.utils        import public_login
-from deals.models       import Deal, Mortgage, MortgageImage
-from investments.models import UserDeal,PaybackSchedule 
-from users.models       import User
+from deals.models       import Deal, PlatformStatistics, InvestmentRollup
+from deals.utils        import (
+    DETAIL_TIMEOUT,
+    STATISTICS_ID,
+    encode_cursor,
+    decode_cursor,
+    cover_image,
+    listing_version,
+    detail_queryset,
+    detail_cache_key,
+    serialize_deal_detail,
+    merge_deal_funding
+)
+from investments.utils     import get_invested_deals
+from investments.schedules import get_option_summaries
 
 class DealDetailView(View):
     def get(self, request, deal_id):
         try:
-            deal = Deal.objects.get(id=deal_id)
-            deal_info = {
-                "name"            : deal.name,
-                "category"        : Deal.Category(deal.category).label,
-                "grade"           : Deal.Grade(deal.grade).label,
-                "earningRate"     : deal.earning_rate,
-                "repaymentPeriod" : deal.repayment_period,
-                "repaymentMethod" : Deal.RepaymentMethod(deal.repayment_method).label,
-                "netAmount"       : deal.net_amount,
-                "repaymentDay"    : deal.repayment_day,
-                "reason"          : deal.reason,
-                "debtor"          : deal.debtor.name,
-                "creditScore"     : [score.score for score in deal.debtor.creditscore_set.all()],
-                "amount"          : deal.userdeal_set.aggregate(total_price=Sum('amount'))['total_price'] or 0,
-                "amountPercentage": int((deal.userdeal_set.aggregate(total_price=Sum('amount'))['total_price'] or 0)/deal.net_amount)*100,
-            }
-            
-            if deal.category == Deal.Category.MORTGAGE.value: 
-                mortgage = Mortgage.objects.get(deal=deal)
-                mortgage_info = {
-                    "latitude"               : mortgage.latitude,
-                    "longitude"              : mortgage.longitude,
-                    "estimatedRecovery"      : mortgage.estimated_recovery,
-                    "appraisedValue"         : mortgage.appraised_value,
-                    "seniorLoanAmount"       : mortgage.senior_loan_amount,
-                    "address"                : mortgage.address,
-                    "completedDate"          : mortgage.completed_date,
-                    "scale"                  : mortgage.scale,
-                    "supplyArea"             : mortgage.supply_area,
-                    "usingArea"              : mortgage.using_area,
-                    "floor"                  : mortgage.floors,
-                    "isUsage"                : mortgage.is_usage,
-                    "sellingPointTitle"      : mortgage.selling_point_title,
-                    "sellingPointDescription": mortgage.selling_point_description,
-                    "mortgageImage"          : [image.image_url for image in mortgage.mortgageimage_set.all()],
-                    "collateralReserve"      : mortgage.appraised_value - (mortgage.senior_loan_amount+deal.net_amount)
-                }
-                return JsonResponse({"dealInfo":deal_info,"mortgageInfo":mortgage_info}, status=200)
-            return JsonResponse({"dealInfo":deal_info}, status=200)
+            updated_at, funded_amount, net_amount = Deal.objects.values_list(
+                'updated_at', 'funded_amount', 'net_amount'
+            ).get(id=deal_id)
+
+            document = cache.get_or_set(
+                detail_cache_key(deal_id, updated_at),
+                lambda: serialize_deal_detail(detail_queryset().get(id=deal_id)),
+                DETAIL_TIMEOUT
+            )
+
+            return JsonResponse(merge_deal_funding(document, funded_amount, net_amount), status=200)
             
         except Deal.DoesNotExist:
             return JsonResponse({"message":"INVALID_ERROR"}, status=400)
 
+class DealBatchView(View):
+    def get(self, request):
+        try:
+            MAX_BATCH_SIZE = 20
+            deal_ids       = list(dict.fromkeys(int(deal_id) for deal_id in request.GET.get('ids', '').split(',') if deal_id))
+
+            if not deal_ids or len(deal_ids) > MAX_BATCH_SIZE:
+                return JsonResponse({"message":"INVALID_INPUT"}, status=400)
+
+            fundings = {
+                deal_id: (detail_cache_key(deal_id, updated_at), funded_amount, net_amount)
+                for deal_id, updated_at, funded_amount, net_amount in Deal.objects.filter(id__in=deal_ids)\
+                    .values_list('id', 'updated_at', 'funded_amount', 'net_amount')
+            }
+
+            documents = cache.get_many([key for key, _, _ in fundings.values()])
+            missing   = [deal_id for deal_id, (key, _, _) in fundings.items() if key not in documents]
+
+            if missing:
+                built = {
+                    fundings[deal.id][0]: serialize_deal_detail(deal) for deal in detail_queryset().filter(id__in=missing)
+                }
+                cache.set_many(built, DETAIL_TIMEOUT)
+                documents.update(built)
+
+            results = []
+            for deal_id in deal_ids:
+                if deal_id not in fundings:
+                    continue
+
+                key, funded_amount, net_amount = fundings[deal_id]
+                results.append(dict(id=deal_id, **merge_deal_funding(documents[key], funded_amount, net_amount)))
+
+            return JsonResponse({"results": results}, status=200)
+
+        except ValueError:
+            return JsonResponse({"message":"VALUE_ERROR"}, status=400)
+
 class DealsView(View):
     @public_login
     def get(self, request):
         try:
-            signed_user = request.user
-            deal_closed = request.GET.get('closed', False)
-            category    = request.GET.get('category', False)
-            PAGE_SIZE   = 12
-            q           = Q()
-            offset      = int(request.GET.get('offset', 0))
-            limit       = int(request.GET.get('limit', PAGE_SIZE)) + offset
+            signed_user     = request.user
+            deal_closed     = request.GET.get('closed', False)
+            category        = request.GET.get('category', False)
+            cursor          = request.GET.get('cursor', None)
+            PAGE_SIZE       = 12
+            MAX_PAGE_SIZE   = 50
+            LISTING_TIMEOUT = 60 * 5
+            q               = Q()
+            offset          = int(request.GET.get('offset', 0))
+            page_size       = min(int(request.GET.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+            after           = decode_cursor(cursor) if cursor else None
+            today           = timezone.localdate()
+
+            if offset < 0 or page_size < 1:
+                return JsonResponse({"message":"VALUE_ERROR"}, status=400)
 
             categories = {
                 'mortgage'  : Deal.Category.MORTGAGE.value,
@@ -76,81 +110,156 @@ class DealsView(View):
             if category not in categories:
                 return JsonResponse({"message":"INVALID_INPUT"}, status=400)
 
-            q.add(Q(category=categories[category]), q.AND)
-            
-            if deal_closed == 'true' and categories[category] == Deal.Category.MORTGAGE.value:
-                q.add(Q(end_date__lt=timezone.localdate()) | Q(net_reservation=F('net_amount')), q.AND)
+            is_mortgage = categories[category] == Deal.Category.MORTGAGE.value
+            version     = listing_version()
+            listing_key = f'deals:listing:{version}:{today}:{category}:{deal_closed == "true"}'
+            after_key   = f'{after[0].isoformat()}|{after[1]}' if after else ''
+            page_key    = f'{listing_key}:{cursor is not None}:{after_key}:{offset}:{page_size}'
+            listing     = cache.get(page_key)
+
+            if listing is None:
+                q.add(Q(category=categories[category]), q.AND)
+
+                if deal_closed == 'true' and is_mortgage:
+                    q.add(Q(end_date__lt=today) | Q(funded_amount__gte=F('net_amount')), q.AND)
+
+                else:
+                    q.add(Q(end_date__gte=today) & Q(start_date__lte=today), q.AND)
+
+                listed_deals = Deal.objects.filter(q).order_by('start_date', 'id')
+                deals        = listed_deals.annotate(title_image=cover_image())
+
+                next_cursor = None
+                if cursor is not None:
+                    if after:
+                        start_date, deal_id = after
+                        deals = deals.filter(Q(start_date__gt=start_date) | Q(start_date=start_date, id__gt=deal_id))
+
+                    deals = list(deals[:page_size + 1])
+                    if len(deals) > page_size:
+                        deals       = deals[:page_size]
+                        next_cursor = encode_cursor(deals[-1])
+
+                else:
+                    deals = deals[offset:offset + page_size]
+
+                listing = {
+                    'results': [
+                        {
+                            'index'           : deal.id,
+                            'title'           : deal.name,
+                            'grade'           : Deal.Grade(deal.grade).label,
+                            'period'          : deal.repayment_period,
+                            'earningRate'     : deal.earning_rate,
+                            'amount'          : deal.net_amount,
+                            'titleImage'      : deal.title_image if is_mortgage else None,
+                            'startDate'       : deal.start_date,
+                            'progress'        : math.trunc((deal.funded_amount / deal.net_amount) * 100),
+                            'investmentAmount': deal.funded_amount
+                        } for deal in deals
+                    ],
+                    'nextCursor': next_cursor
+                }
+
+                if deal_closed != 'true' and is_mortgage:
+                    listing['scheduledResults'] = [
+                        {
+                            'index'      : deal.id,
+                            'title'      : deal.name,
+                            'period'     : deal.repayment_period,
+                            'earningRate': deal.earning_rate,
+                            'amount'     : deal.net_amount,
+                            'titleImage' : deal.title_image,
+                            'startDate'  : deal.start_date
+                        } for deal in Deal.objects.filter(status=Deal.Status.SCHEDULED.value, category=Deal.Category.MORTGAGE.value)\
+                            .annotate(title_image=cover_image()).order_by('start_date', 'id')[:MAX_PAGE_SIZE]
+                    ]
+
+                else:
+                    listing['count'] = cache.get_or_set(f'{listing_key}:count', listed_deals.count, LISTING_TIMEOUT)
+
+                cache.set(page_key, listing, LISTING_TIMEOUT)
+
+            invested_deals = get_invested_deals(signed_user)
+            results = [dict(result, invested=result['index'] in invested_deals) for result in listing['results']]
+
+            if deal_closed != 'true' and is_mortgage:
+                response = {"recruitingResults": results, "scheduledResults": listing['scheduledResults']}
 
             else:
-                limit  = None
-                q.add(Q(end_date__gte=timezone.localdate()) & Q(start_date__lte=timezone.localdate()), q.AND)
-
-            deals = Deal.objects.annotate(net_reservation=Sum('userdeal__amount')).filter(q).prefetch_related(
-                Prefetch('userdeal_set', queryset=UserDeal.objects.filter(user=signed_user), to_attr='userdeals'),
-                Prefetch(
-                    'mortgage_set', 
-                    queryset=Mortgage.objects.prefetch_related(
-                        Prefetch(
-                            'mortgageimage_set', 
-                            queryset=MortgageImage.objects.all(), 
-                            to_attr='image')
-                            ), to_attr='mortgages')
-                    )
-
-            results = [
-                {
-                    'index'           : deal.id,
-                    'title'           : deal.name,
-                    'grade'           : Deal.Grade(deal.grade).label,
-                    'period'          : deal.repayment_period,
-                    'earningRate'     : deal.earning_rate,
-                    'amount'          : deal.net_amount,
-                    'titleImage'      : deal.mortgages[0].image[0].image_url\
-                                        if categories[category] == Deal.Category.MORTGAGE.value else None,
-                    'startDate'       : deal.start_date,
-                    'progress'        : math.trunc(((deal.net_reservation or 0) / deal.net_amount) * 100),
-                    'investmentAmount': deal.net_reservation or 0,
-                    'invested'        : True if deal.userdeals else False
-                } for deal in deals[offset:limit]
-            ]
-
-            if deal_closed != 'true' and categories[category] == Deal.Category.MORTGAGE.value:
-                scheduled_results = [
-                    {
-                        'index'      : deal.id,
-                        'title'      : deal.name,
-                        'period'     : deal.repayment_period,
-                        'earningRate': deal.earning_rate,
-                        'amount'     : deal.net_amount,
-                        'titleImage' : deal.mortgages[0].image[0].image_url,
-                        'startDate'  : deal.start_date
-                    } for deal in Deal.objects.filter(status=Deal.Status.SCHEDULED.value, category=Deal.Category.MORTGAGE.value).prefetch_related(
-                Prefetch(
-                    'mortgage_set', 
-                    queryset=Mortgage.objects.prefetch_related(
-                        Prefetch(
-                            'mortgageimage_set', 
-                            queryset=MortgageImage.objects.all(), 
-                            to_attr='image')
-                            ), to_attr='mortgages'))
-                ]
-
-                return JsonResponse({"recruitingResults": results, "scheduledResults": scheduled_results}, status=200)
-            
-            return JsonResponse({"results":results, "count":len(deals)}, status=200)
+                response = {"results": results, "count": listing['count']}
+
+            if cursor is not None:
+                response["nextCursor"] = listing['nextCursor']
+
+            return JsonResponse(response, status=200)
 
         except ValueError:
             return JsonResponse({"message":"VALUE_ERROR"}, status=400)
 
 class LoanAmountView(View):
     def get(self, request):
+        MAX_AGE                = 60
+        STALE_WHILE_REVALIDATE = 60 * 10
+
+        statistics = PlatformStatistics.objects.filter(id=STATISTICS_ID).first() or PlatformStatistics()
+
         result = {
-            "loanAcc": UserDeal.objects.filter(deal__end_date__lt=timezone.localdate()).aggregate(Sum('amount'))['amount__sum'],
-            "avgPerPerson": int(UserDeal.objects.aggregate(Sum('amount'))['amount__sum'] / User.objects.count()),
-            "investAcc": UserDeal.objects.count()
+            "loanAcc"     : statistics.loan_amount,
+            "avgPerPerson": int(statistics.invested_amount / statistics.user_count) if statistics.user_count else 0,
+            "investAcc"   : statistics.investment_count
         }
 
-        return JsonResponse({"result": result}, status=200)
+        response = JsonResponse({"result": result}, status=200)
+        response['Cache-Control'] = f'public, max-age={MAX_AGE}, stale-while-revalidate={STALE_WHILE_REVALIDATE}'
+
+        return response
+
+class LoanAmountHistoryView(View):
+    def get(self, request):
+        try:
+            periods = {
+                'day'  : InvestmentRollup.Period.DAY.value,
+                'month': InvestmentRollup.Period.MONTH.value
+            }
+            period = request.GET.get('period', 'day')
+
+            if period not in periods:
+                return JsonResponse({"message":"INVALID_INPUT"}, status=400)
+
+            today   = timezone.localdate()
+            default = today - timezone.timedelta(days=30) if period == 'day' else today.replace(day=1, year=today.year - 1)
+            start   = date.fromisoformat(request.GET.get('start', default.isoformat()))
+            end     = date.fromisoformat(request.GET.get('end', today.isoformat()))
+            rollups = InvestmentRollup.objects.filter(period=periods[period])
+
+            accumulated = rollups.filter(date__lt=start).aggregate(
+                invested_amount  = Coalesce(Sum('invested_amount'), 0),
+                investment_count = Coalesce(Sum('investment_count'), 0),
+                repaid_principal = Coalesce(Sum('repaid_principal'), 0)
+            )
+
+            results = []
+            for rollup in rollups.filter(date__gte=start, date__lte=end).order_by('date'):
+                accumulated['invested_amount']  += rollup.invested_amount
+                accumulated['investment_count'] += rollup.investment_count
+                accumulated['repaid_principal'] += rollup.repaid_principal
+
+                results.append({
+                    'date'            : rollup.date,
+                    'investedAmount'  : rollup.invested_amount,
+                    'investmentCount' : rollup.investment_count,
+                    'repaidPrincipal' : rollup.repaid_principal,
+                    'investorCount'   : rollup.investor_count,
+                    'loanAcc'         : accumulated['invested_amount'],
+                    'investAcc'       : accumulated['investment_count'],
+                    'repaidAcc'       : accumulated['repaid_principal']
+                })
+
+            return JsonResponse({"results": results}, status=200)
+
+        except ValueError:
+            return JsonResponse({"message":"VALUE_ERROR"}, status=400)
 
 class DealPaybackView(View):
     @public_login
@@ -158,36 +267,14 @@ class DealPaybackView(View):
         user    = request.user
         deposit = user.deposit_amount if user else None
 
-        options = {}
-
         deal = Deal.objects.get(id=deal_id)
 
-        payback_schedules = PaybackSchedule.objects.filter(deal_id = deal_id)
-
-        for payback_schedule in payback_schedules:
-            if not options.get(payback_schedule.option):
-                options[payback_schedule.option] = {
-                    'realityPrice': payback_schedule.option,
-                    'tax'         : 0,
-                    'interest'    : 0,
-                    'commission'  : 0
-                }
-
-            interest = payback_schedule.interest
-            tax = payback_schedule.tax
-            commission = payback_schedule.commission
-
-            options[payback_schedule.option]['realityPrice'] += (interest - tax - commission)
-            options[payback_schedule.option]['tax']          += tax
-            options[payback_schedule.option]['interest']     += interest
-            options[payback_schedule.option]['commission']   += commission
-
         results = {
             'deposit'     : deposit,
-            'invested'    : UserDeal.objects.filter(user=user, deal_id=deal_id).exists(),
+            'invested'    : deal.id in get_invested_deals(user),
             'status'      : Deal.Status(deal.status).name,
-            'investCount' : UserDeal.objects.filter(deal_id=deal_id).count(),
-            'options'     : options
+            'investCount' : deal.investor_count,
+            'options'     : get_option_summaries(deal)
         }
 
         return JsonResponse({"results": results}, status=200)
@@ -0,0 +1,139 @@
+from django.db        import transaction
+from django.db.models import F, Sum, Case, When, Value, OuterRef, Subquery
+from django.utils     import timezone
+
+from deals.models            import Deal
+from deals.rollups           import lower_rollup_watermark
+from investments.models      import UserDeal, UserPayback
+from investments.schedules   import load_schedules
+from investments.statistics  import add_paid_statistics
+from investments.export_jobs import expire_export_jobs
+from users.models            import User
+
+DISBURSEMENT_CHUNK_SIZE = 5000
+
+class DisbursementError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+def net_payback():
+    return F('principal') + F('interest') - F('tax') - F('commission')
+
+def disburse_paybacks(deal, payback_round, chunk_size):
+    pending = UserPayback.objects.filter(users_deals__deal_id=deal.id, payback_round=payback_round)\
+        .exclude(state=UserPayback.State.PAID.value)
+
+    last_id, settled, credited, earliest = 0, 0, 0, None
+    while True:
+        with transaction.atomic():
+            rows = list(
+                pending.filter(id__gt=last_id).select_for_update().order_by('id')\
+                    .annotate(net=net_payback()).values_list('id', 'net', 'payback_date')[:chunk_size]
+            )
+
+            if not rows:
+                break
+
+            ids     = [row[0] for row in rows]
+            credits = UserPayback.objects.filter(id__in=ids, users_deals__user=OuterRef('pk')).order_by()\
+                .values('users_deals__user').annotate(total=Sum(net_payback())).values('total')
+
+            User.objects.filter(id__in=UserPayback.objects.filter(id__in=ids).values('users_deals__user')).update(
+                deposit_amount = F('deposit_amount') + Subquery(credits)
+            )
+            UserPayback.objects.filter(id__in=ids).update(state=UserPayback.State.PAID.value, updated_at=timezone.now())
+
+            paid = UserPayback.objects.filter(id__in=ids, users_deals__user__isnull=False)\
+                .values('users_deals__user').annotate(
+                    principal  = Sum('principal'),
+                    interest   = Sum('interest'),
+                    commission = Sum('commission')
+                ).order_by().values_list('users_deals__user', 'principal', 'interest', 'commission')
+            add_paid_statistics(deal, {user_id: amounts for user_id, *amounts in paid})
+
+        last_id   = ids[-1]
+        settled  += len(rows)
+        credited += sum(row[1] for row in rows)
+        earliest  = min([row[2] for row in rows] + ([earliest] if earliest else []))
+
+    return settled, credited, earliest
+
+def disburse_schedule(deal, payback_round, chunk_size):
+    pending = UserDeal.objects.filter(
+        deal_id      = deal.id,
+        payback_mode = UserDeal.PaybackMode.DERIVED.value,
+        paid_round   = payback_round - 1
+    )
+
+    last_id, settled, credited, earliest = 0, 0, 0, None
+    while True:
+        with transaction.atomic():
+            rows = list(
+                pending.filter(id__gt=last_id).select_for_update().order_by('id')\
+                    .values_list('id', 'user_id', 'amount')[:chunk_size]
+            )
+
+            if not rows:
+                break
+
+            ids        = [row[0] for row in rows]
+            overridden = set(
+                UserPayback.objects.filter(users_deals_id__in=ids, payback_round=payback_round)\
+                    .values_list('users_deals_id', flat=True)
+            )
+            schedules  = load_schedules((deal.id, amount) for _, _, amount in rows)
+            paybacks   = {
+                amount: schedule for (_, amount), rounds in schedules.items()
+                for schedule in rounds if schedule.payback_round == payback_round
+            }
+            payable    = [row for row in rows if row[0] not in overridden and row[2] in paybacks]
+            nets       = {
+                amount: payback.principal + payback.interest - payback.tax - payback.commission
+                for amount, payback in paybacks.items()
+            }
+
+            if payable:
+                credits = UserDeal.objects.filter(deal_id=deal.id, user=OuterRef('pk')).annotate(
+                    net = Case(*[When(amount=amount, then=Value(net)) for amount, net in nets.items()], default=Value(0))
+                ).values('net')[:1]
+
+                User.objects.filter(id__in=[row[1] for row in payable]).update(
+                    deposit_amount = F('deposit_amount') + Subquery(credits)
+                )
+                add_paid_statistics(deal, {
+                    user_id: (paybacks[amount].principal, paybacks[amount].interest, paybacks[amount].commission)
+                    for _, user_id, amount in payable if user_id
+                })
+
+            UserDeal.objects.filter(id__in=ids).update(paid_round=payback_round, updated_at=timezone.now())
+
+        last_id   = ids[-1]
+        settled  += len(payable)
+        credited += sum(nets[row[2]] for row in payable)
+        dates     = [paybacks[row[2]].payback_date for row in payable] + ([earliest] if earliest else [])
+        earliest  = min(dates) if dates else None
+
+    return settled, credited, earliest
+
+def disburse_round(deal_id, payback_round, chunk_size=DISBURSEMENT_CHUNK_SIZE):
+    behind = UserDeal.objects.filter(
+        deal_id        = deal_id,
+        payback_mode   = UserDeal.PaybackMode.DERIVED.value,
+        paid_round__lt = payback_round - 1
+    )
+
+    if behind.exists():
+        raise DisbursementError('UNPAID_ROUND')
+
+    deal                                     = Deal.objects.get(id=deal_id)
+    paybacks, paybacks_amount, paybacks_date = disburse_paybacks(deal, payback_round, chunk_size)
+    derived, derived_amount, derived_date    = disburse_schedule(deal, payback_round, chunk_size)
+
+    dates = [date for date in [paybacks_date, derived_date] if date]
+    if dates:
+        lower_rollup_watermark(min(dates))
+
+    expire_export_jobs(deal_id=deal_id)
+
+    return paybacks + derived, paybacks_amount + derived_amount
@@ -0,0 +1,127 @@
+import os
+
+from django.conf      import settings
+from django.db        import transaction
+from django.db.models import Q
+from django.utils     import timezone
+
+from investments.models  import UserDeal, ExportJob
+from investments.exports import EXPORT_COLUMNS, EXPORT_FORMATS, export_rows
+from users.models        import User
+
+EXPORT_JOB_BATCH_SIZE = 10
+EXPORT_JOB_TIMEOUT    = timezone.timedelta(minutes=30)
+
+class ExportError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+def abandoned(now):
+    return Q(state=ExportJob.State.RUNNING.value, updated_at__lt=now - EXPORT_JOB_TIMEOUT)
+
+def expire_export_jobs(user_ids=None, deal_id=None):
+    jobs = ExportJob.objects.filter(is_stale=False)
+
+    if user_ids is not None:
+        jobs = jobs.filter(user_id__in=user_ids)
+
+    if deal_id is not None:
+        jobs = jobs.filter(user_id__in=UserDeal.objects.filter(deal_id=deal_id).values('user_id'))
+
+    return jobs.update(is_stale=True)
+
+def submit_export(user, export_format, delta=False):
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError('INVALID_FORMAT')
+
+    jobs     = ExportJob.objects.filter(user=user, format=export_format)
+    reusable = jobs.filter(is_stale=False, since__isnull=not delta)\
+        .exclude(Q(state=ExportJob.State.FAILED.value) | abandoned(timezone.now())).order_by('-id').first()
+
+    if reusable:
+        return reusable, False
+
+    since = None
+    if delta:
+        since = jobs.filter(state=ExportJob.State.COMPLETED.value).order_by('-id')\
+            .values_list('created_at', flat=True).first()
+
+        if not since:
+            raise ExportError('EXPORT_REQUIRED')
+
+    return ExportJob.objects.create(user=user, format=export_format, since=since), True
+
+def export_file_path(job):
+    return os.path.join(settings.EXPORT_ROOT, f'{job.user_id}-{job.id}.{job.format}')
+
+def render_export(job, user):
+    _, stream = EXPORT_FORMATS[job.format]
+    path      = export_file_path(job)
+    rows      = [0]
+
+    def counted(rows_iterator):
+        for row in rows_iterator:
+            rows[0] += 1
+            yield row
+
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+
+    try:
+        with open(f'{path}.tmp', 'wb') as export_file:
+            for chunk in stream(EXPORT_COLUMNS, counted(export_rows(user, since=job.since))):
+                export_file.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+
+        os.replace(f'{path}.tmp', path)
+
+    except Exception:
+        if os.path.exists(f'{path}.tmp'):
+            os.remove(f'{path}.tmp')
+        raise
+
+    return path, rows[0]
+
+def purge_export_files(user_ids):
+    jobs = list(
+        ExportJob.objects.filter(user_id__in=user_ids, is_stale=True, file_path__isnull=False)\
+            .exclude(state=ExportJob.State.RUNNING.value)
+    )
+
+    for job in jobs:
+        try:
+            os.remove(job.file_path)
+
+        except FileNotFoundError:
+            pass
+
+    return ExportJob.objects.filter(id__in=[job.id for job in jobs]).update(file_path=None, updated_at=timezone.now())
+
+def process_export_jobs(batch_size=EXPORT_JOB_BATCH_SIZE):
+    with transaction.atomic():
+        jobs = list(
+            ExportJob.objects.select_for_update(skip_locked=True)\
+                .filter(Q(state=ExportJob.State.PENDING.value) | abandoned(timezone.now())).order_by('id')[:batch_size]
+        )
+        ExportJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            state      = ExportJob.State.RUNNING.value,
+            updated_at = timezone.now()
+        )
+
+    users = User.objects.in_bulk({job.user_id for job in jobs})
+
+    for job in jobs:
+        try:
+            job.file_path, job.row_count = render_export(job, users[job.user_id])
+            job.state, job.message       = ExportJob.State.COMPLETED.value, 'SUCCESS'
+
+        except OSError:
+            job.state, job.message = ExportJob.State.FAILED.value, 'WRITE_ERROR'
+
+        except Exception:
+            job.state, job.message = ExportJob.State.FAILED.value, 'UNKNOWN_ERROR'
+
+        job.save(update_fields=['file_path', 'row_count', 'state', 'message', 'updated_at'])
+
+    purge_export_files({job.user_id for job in jobs})
+
+    return len(jobs)
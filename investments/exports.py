@@ -0,0 +1,206 @@
+import csv
+import zipfile
+
+from itertools        import chain
+from xml.sax.saxutils import escape
+
+from django.db.models           import F, Q, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils               import timezone
+
+from deals.models          import Deal
+from investments.models    import UserDeal, UserPayback, UnitSchedule
+from investments.schedules import load_schedules
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FLUSH_ROWS = 500
+PAID_FIELDS       = ['principal', 'interest', 'tax', 'commission']
+
+EXPORT_COLUMNS = [
+    '투자일',
+    '상품호수',
+    '상품명',
+    '등급',
+    '예상수익률(%)',
+    '투자기간(개월)',
+    '투자금액',
+    '지급받은 원금',
+    '지급받은 이자',
+    '세금',
+    '커미션'
+]
+
+XLSX_SHEET_NAME   = '투자내역'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_PARTS        = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{XLSX_SHEET_NAME}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+}
+XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_FOOTER = '</sheetData></worksheet>'
+
+def changed_since(since):
+    return Q(created_at__gt=since) | Q(updated_at__gt=since) | Q(deal__updated_at__gt=since) | \
+        Q(id__in=UserPayback.objects.filter(updated_at__gt=since).values('users_deals_id')) | \
+        Q(deal_id__in=UnitSchedule.objects.filter(updated_at__gt=since).values('deal_id'))
+
+def export_rows(user, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    paid        = UserPayback.objects.filter(users_deals=OuterRef('pk'), state=UserPayback.State.PAID.value)\
+        .order_by().values('users_deals')
+    investments = UserDeal.objects.filter(user=user, deal__isnull=False)
+
+    if since:
+        investments = investments.filter(changed_since(since))
+
+    investments = investments.select_related('deal').annotate(**{
+        f'paid_{field}': Coalesce(Subquery(paid.annotate(total=Sum(field)).values('total')), 0) for field in PAID_FIELDS
+    }).order_by('id')
+
+    last_id = 0
+    while True:
+        chunk = list(investments.filter(id__gt=last_id)[:chunk_size])
+
+        if not chunk:
+            return
+
+        last_id = chunk[-1].id
+
+        add_derived_paid(chunk)
+
+        for investment in chunk:
+            yield [
+                timezone.localtime(investment.created_at).strftime("%Y-%m-%d"),
+                investment.id,
+                investment.deal.name,
+                Deal.Grade(investment.deal.grade).label,
+                investment.deal.earning_rate,
+                investment.deal.repayment_period,
+                investment.amount,
+                investment.paid_principal,
+                investment.paid_interest,
+                investment.paid_tax,
+                investment.paid_commission
+            ]
+
+def add_derived_paid(investments):
+    derived = [
+        investment for investment in investments
+        if investment.payback_mode == UserDeal.PaybackMode.DERIVED and investment.paid_round > 0
+    ]
+
+    if not derived:
+        return
+
+    overridden = set(
+        UserPayback.objects.filter(users_deals__in=derived, payback_round__lte=F('users_deals__paid_round'))\
+            .values_list('users_deals_id', 'payback_round')
+    )
+    schedules  = load_schedules((investment.deal_id, investment.amount) for investment in derived)
+
+    for investment in derived:
+        for schedule in schedules[(investment.deal_id, investment.amount)]:
+            if schedule.payback_round > investment.paid_round:
+                break
+
+            if (investment.id, schedule.payback_round) in overridden:
+                continue
+
+            for field in PAID_FIELDS:
+                setattr(investment, f'paid_{field}', getattr(investment, f'paid_{field}') + getattr(schedule, field))
+
+class StreamBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+
+        return data
+
+class Echo:
+    def write(self, value):
+        return value
+
+def xlsx_cell(value):
+    if isinstance(value, str):
+        return f'<c t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+
+    return f'<c><v>{value}</v></c>'
+
+def stream_xlsx(columns, rows, flush_rows=EXPORT_FLUSH_ROWS):
+    buffer = StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(XLSX_SHEET_HEADER.encode('utf-8'))
+
+            for number, row in enumerate(chain([columns], rows), 1):
+                sheet.write(f'<row>{"".join(xlsx_cell(value) for value in row)}</row>'.encode('utf-8'))
+
+                if number % flush_rows == 0:
+                    yield buffer.drain()
+
+            sheet.write(XLSX_SHEET_FOOTER.encode('utf-8'))
+
+    yield buffer.drain()
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+
+    yield '\ufeff' + writer.writerow(columns)
+
+    for row in rows:
+        yield writer.writerow(row)
+
+EXPORT_FORMATS = {
+    'xlsx' : (XLSX_CONTENT_TYPE, stream_xlsx),
+    'csv'  : ('text/csv; charset=utf-8', stream_csv)
+}
@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime           import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db                   import connection, DatabaseError
+from django.utils                import timezone
+
+from deals.models          import Deal, Debtor
+from users.models          import Bank, User
+from investments.models    import PaybackSchedule, UserDeal, UnitSchedule
+from investments.orders    import OrderError, validate_order, create_investments
+from investments.schedules import publish_schedules
+
+MYSQL_DEADLOCK    = 1213
+POSTGRES_DEADLOCK = '40P01'
+
+def is_deadlock(error):
+    cause = error.__cause__
+
+    return getattr(cause, 'pgcode', None) == POSTGRES_DEADLOCK or getattr(cause, 'args', (None,))[:1] == (MYSQL_DEADLOCK,)
+
+class Command(BaseCommand):
+    help = 'Run concurrent investments against one deal and report commits per second and p99 latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investors', nargs='+', type=int, default=[50, 200, 1000])
+        parser.add_argument('--workers', type=int, default=100, help='maximum concurrent database connections')
+        parser.add_argument('--amount', type=int, default=PaybackSchedule.Option.OPTION_5.value)
+
+    def handle(self, *args, **options):
+        for investors in options['investors']:
+            self.stdout.write(self.benchmark(investors, min(investors, options['workers']), options['amount']))
+
+    def benchmark(self, investors, workers, amount):
+        deal, users = self.set_up(investors, amount)
+
+        def invest(user):
+            started = time.perf_counter()
+            try:
+                create_investments(user, validate_order(user, [{'id': deal.id, 'amount': amount}]))
+                outcome = 'committed'
+
+            except OrderError:
+                outcome = 'rejected'
+
+            except DatabaseError as error:
+                outcome = 'deadlocked' if is_deadlock(error) else 'failed'
+
+            finally:
+                connection.close()
+
+            return outcome, time.perf_counter() - started
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(invest, users))
+            elapsed = time.perf_counter() - started
+
+            deal.refresh_from_db()
+            outcomes  = [outcome for outcome, _ in results]
+            latencies = np.array([latency for _, latency in results]) * 1000
+
+            return (
+                f'{investors} investors: {outcomes.count("committed") / elapsed:.1f} commits/s, '
+                f'p99 {np.percentile(latencies, 99):.1f}ms, '
+                f'{outcomes.count("committed")} committed, {outcomes.count("rejected")} rejected, '
+                f'{outcomes.count("deadlocked")} deadlocked, {outcomes.count("failed")} failed, funded {deal.funded_amount}/{deal.net_amount}'
+            )
+
+        finally:
+            self.tear_down(deal, users)
+
+    def set_up(self, investors, amount):
+        today  = timezone.localdate()
+        bank   = Bank.objects.first()
+
+        if not bank:
+            raise CommandError('BANK_DOES_NOT_EXIST')
+
+        debtor = Debtor.objects.create(name='benchmark', birth_date=today)
+        deal   = Deal.objects.create(
+            name             = 'benchmark',
+            category         = Deal.Category.MORTGAGE.value,
+            grade            = Deal.Grade.A.value,
+            earning_rate     = 8,
+            interest_rate    = 8,
+            repayment_period = 12,
+            repayment_method = Deal.RepaymentMethod.MATURE.value,
+            net_amount       = amount * investors // 2,
+            repayment_day    = 25,
+            start_date       = today,
+            end_date         = today + timedelta(days=30),
+            reason           = 'benchmark',
+            debtor           = debtor,
+            status           = Deal.Status.APPLYING.value
+        )
+        publish_schedules(deal)
+
+        users = [
+            User.objects.create(
+                email           = f'benchmark-{deal.id}-{i}@ttpercent.com',
+                deposit_account = f'benchmark-{deal.id}-{i}',
+                deposit_bank    = bank
+            ) for i in range(investors)
+        ]
+
+        return deal, users
+
+    def tear_down(self, deal, users):
+        UserDeal.objects.filter(deal=deal).delete()
+        PaybackSchedule.objects.filter(deal=deal).delete()
+        UnitSchedule.objects.filter(deal=deal).delete()
+        User.objects.filter(id__in=[user.id for user in users]).delete()
+        deal.delete()
+        deal.debtor.delete()
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.models              import Deal
+from investments.disbursements import DISBURSEMENT_CHUNK_SIZE, DisbursementError, disburse_round
+
+class Command(BaseCommand):
+    help = 'Mark a payback round of a deal as paid and credit the investors deposits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_id', type=int)
+        parser.add_argument('payback_round', type=int)
+        parser.add_argument('--chunk-size', type=int, default=DISBURSEMENT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        deal = Deal.objects.filter(id=options['deal_id']).first()
+
+        if not deal:
+            raise CommandError('INVALID_DEAL')
+
+        if not 1 <= options['payback_round'] <= deal.repayment_period:
+            raise CommandError('INVALID_ROUND')
+
+        started = time.perf_counter()
+
+        try:
+            settled, amount = disburse_round(deal.id, options['payback_round'], options['chunk_size'])
+
+        except DisbursementError as error:
+            raise CommandError(error.message)
+
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{settled} payback(s), {amount} won settled in {elapsed:.2f}s ({settled / elapsed if elapsed else 0:.0f}/s)'
+        )
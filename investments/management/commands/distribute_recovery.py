@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.models           import Deal
+from investments.recoveries import RecoveryError, distribute_recovery
+
+class Command(BaseCommand):
+    help = 'Split a recovered amount of a non-performing deal across its investors by outstanding principal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_id', type=int)
+        parser.add_argument('amount', type=int, help='recovered amount in won')
+        parser.add_argument('--date', type=date.fromisoformat, help='payback date of the recovery (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        deal = Deal.objects.filter(id=options['deal_id']).first()
+
+        if not deal:
+            raise CommandError('INVALID_DEAL')
+
+        try:
+            payback_round, holders = distribute_recovery(deal, options['amount'], options['date'])
+
+        except RecoveryError as error:
+            raise CommandError(error.message)
+
+        self.stdout.write(f'{options["amount"]} won distributed to {holders} investment(s) as round {payback_round}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.models            import Deal
+from investments.prepayments import PREPAYMENT_CHUNK_SIZE, PrepaymentError, prepay_deal
+
+class Command(BaseCommand):
+    help = 'Recalculate the remaining payback rounds of a deal after a prepayment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_id', type=int)
+        parser.add_argument('payback_round', type=int, help='round in which the prepaid principal is returned')
+        parser.add_argument('--amount', type=int, help='prepaid principal in won; omit for early termination')
+        parser.add_argument('--chunk-size', type=int, default=PREPAYMENT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        deal = Deal.objects.filter(id=options['deal_id']).first()
+
+        if not deal:
+            raise CommandError('INVALID_DEAL')
+
+        try:
+            updated, terminated = prepay_deal(deal, options['payback_round'], options['amount'], options['chunk_size'])
+
+        except PrepaymentError as error:
+            raise CommandError(error.message)
+
+        self.stdout.write(f'{updated} payback(s) recalculated{", deal terminated" if terminated else ""}')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from investments.export_jobs import EXPORT_JOB_BATCH_SIZE, process_export_jobs
+
+class Command(BaseCommand):
+    help = 'Render pending investment history export jobs to disk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=EXPORT_JOB_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep polling for new export jobs')
+        parser.add_argument('--interval', type=float, default=1.0, help='seconds to sleep when no job is pending')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_export_jobs(options['batch_size'])
+
+            if processed:
+                self.stdout.write(f'{processed} export job(s) processed')
+
+            if not options['loop']:
+                break
+
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from investments.orders import ORDER_BATCH_SIZE, process_orders
+
+class Command(BaseCommand):
+    help = 'Commit pending investment orders in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ORDER_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep polling for new orders')
+        parser.add_argument('--interval', type=float, default=0.5, help='seconds to sleep when no order is pending')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_orders(options['batch_size'])
+
+            if processed:
+                self.stdout.write(f'{processed} order(s) processed')
+
+            if not options['loop']:
+                break
+
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.models          import Deal
+from investments.schedules import publish_schedules, verify_schedules
+
+class Command(BaseCommand):
+    help = 'Generate the unit payback schedule of the given deals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal_ids', nargs='+', type=int)
+        parser.add_argument('--verify', action='store_true', help='diff against stored rows without writing')
+
+    def handle(self, *args, **options):
+        deals = Deal.objects.filter(id__in=options['deal_ids']).order_by('id')
+
+        if len(deals) != len(set(options['deal_ids'])):
+            raise CommandError('INVALID_DEAL')
+
+        for deal in deals:
+            if not options['verify']:
+                self.stdout.write(f'deal {deal.id}: {publish_schedules(deal)} round(s) published')
+                continue
+
+            diffs = verify_schedules(deal)
+            for option, payback_round, field, saved, generated in diffs:
+                self.stdout.write(f'deal {deal.id} option {option} round {payback_round} {field}: {saved} != {generated}')
+
+            self.stdout.write(f'deal {deal.id}: {len(diffs)} difference(s)')
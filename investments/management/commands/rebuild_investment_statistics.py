@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from investments.models     import UserDeal, UserInvestmentStatistics
+from investments.statistics import rebuild_user_statistics
+from users.models           import User
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized per-user investment statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+        parser.add_argument('--stale', action='store_true', help='only rebuild users with stale statistics')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(id__in=UserDeal.objects.values('user_id'))
+
+        if options['user_ids']:
+            users = User.objects.filter(id__in=options['user_ids'])
+
+        if options['stale']:
+            users = users.filter(id__in=UserInvestmentStatistics.objects.filter(is_stale=True).values('user_id'))
+
+        rebuilt = 0
+        for user in users.order_by('id').iterator():
+            rebuild_user_statistics(user)
+            rebuilt += 1
+
+        self.stdout.write(f'{rebuilt} user(s) rebuilt')
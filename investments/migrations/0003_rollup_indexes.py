@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userdeal',
+            index=models.Index(fields=['created_at'], name='users_deals_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userpayback',
+            index=models.Index(fields=['state', 'payback_date'], name='user_paybacks_state_date_idx'),
+        ),
+    ]
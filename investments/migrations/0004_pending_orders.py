@@ -0,0 +1,34 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('investments', '0003_rollup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('items', models.JSONField()),
+                ('state', models.IntegerField(choices=[(1, '접수'), (2, '완료'), (3, '실패')], default=1)),
+                ('message', models.CharField(max_length=50, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.user')),
+            ],
+            options={
+                'db_table': 'pending_orders',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pendingorder',
+            index=models.Index(fields=['state', 'id'], name='pending_orders_state_idx'),
+        ),
+    ]
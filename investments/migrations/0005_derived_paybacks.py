@@ -0,0 +1,23 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0004_pending_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdeal',
+            name='paid_round',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userdeal',
+            name='payback_mode',
+            field=models.IntegerField(choices=[(1, '개별 상환내역'), (2, '상품 상환일정')], default=1),
+        ),
+    ]
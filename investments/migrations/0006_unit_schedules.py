@@ -0,0 +1,35 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0006_investment_rollups'),
+        ('investments', '0005_derived_paybacks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payback_round', models.IntegerField()),
+                ('principal', models.BigIntegerField()),
+                ('interest', models.BigIntegerField()),
+                ('payback_date', models.DateField()),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='deals.deal')),
+            ],
+            options={
+                'db_table': 'unit_schedules',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='unitschedule',
+            constraint=models.UniqueConstraint(fields=('deal', 'payback_round'), name='unique_unit_schedule_round'),
+        ),
+    ]
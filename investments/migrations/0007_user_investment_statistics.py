@@ -0,0 +1,38 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('investments', '0006_unit_schedules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserInvestmentStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField()),
+                ('total_amount', models.BigIntegerField(default=0)),
+                ('total_interest', models.BigIntegerField(default=0)),
+                ('total_commission', models.BigIntegerField(default=0)),
+                ('paid_principal', models.BigIntegerField(default=0)),
+                ('paid_interest', models.BigIntegerField(default=0)),
+                ('paid_commission', models.BigIntegerField(default=0)),
+                ('mortgage_outstanding', models.BigIntegerField(default=0)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.user')),
+            ],
+            options={
+                'db_table': 'user_investment_statistics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='userinvestmentstatistics',
+            constraint=models.UniqueConstraint(fields=('user', 'status'), name='unique_user_statistics_status'),
+        ),
+    ]
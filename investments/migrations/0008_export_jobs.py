@@ -0,0 +1,42 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('investments', '0007_user_investment_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('format', models.CharField(max_length=10)),
+                ('since', models.DateTimeField(null=True)),
+                ('state', models.IntegerField(choices=[(1, '접수'), (2, '생성중'), (3, '완료'), (4, '실패')], default=1)),
+                ('file_path', models.CharField(max_length=200, null=True)),
+                ('row_count', models.IntegerField(default=0)),
+                ('message', models.CharField(max_length=50, null=True)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.user')),
+            ],
+            options={
+                'db_table': 'export_jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['state', 'id'], name='export_jobs_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['user', 'format', 'is_stale'], name='export_jobs_user_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0008_export_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paybackschedule',
+            index=models.Index(fields=['payback_date'], name='payback_schedules_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unitschedule',
+            index=models.Index(fields=['payback_date'], name='unit_schedules_date_idx'),
+        ),
+    ]
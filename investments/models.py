@@ -3,15 +3,24 @@ from django.db  import models
 from core.models    import TimeStampModel
 
 class UserDeal(TimeStampModel):
-    user       = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True)
-    deal       = models.ForeignKey('deals.Deal', on_delete=models.SET_NULL, null=True)
-    amount     = models.IntegerField()
+    class PaybackMode(models.IntegerChoices):
+        MATERIALIZED = 1, '개별 상환내역'
+        DERIVED      = 2, '상품 상환일정'
+
+    user         = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True)
+    deal         = models.ForeignKey('deals.Deal', on_delete=models.SET_NULL, null=True)
+    amount       = models.IntegerField()
+    payback_mode = models.IntegerField(choices=PaybackMode.choices, default=PaybackMode.MATERIALIZED)
+    paid_round   = models.IntegerField(default=0)
 
     class Meta:
         db_table = 'users_deals'
         constraints = [ 
             models.UniqueConstraint(fields=['user', 'deal'], name='unique_user_deal')
         ]
+        indexes = [
+            models.Index(fields=['created_at'], name='users_deals_created_idx')
+        ]
 
 class UserPayback(TimeStampModel):
     class State(models.IntegerChoices):
@@ -30,6 +39,9 @@ class UserPayback(TimeStampModel):
 
     class Meta:
         db_table = 'user_paybacks'
+        indexes  = [
+            models.Index(fields=['state', 'payback_date'], name='user_paybacks_state_date_idx')
+        ]
 
 class PaybackSchedule(TimeStampModel):
     class Option(models.IntegerChoices):
@@ -67,4 +79,81 @@ class PaybackSchedule(TimeStampModel):
     payback_date  = models.DateField()
 
     class Meta:
-        db_table = 'payback_schedules'
\ No newline at end of file
+        db_table = 'payback_schedules'
+        indexes  = [
+            models.Index(fields=['payback_date'], name='payback_schedules_date_idx')
+        ]
+
+class PendingOrder(TimeStampModel):
+    class State(models.IntegerChoices):
+        PENDING   = 1, '접수'
+        COMPLETED = 2, '완료'
+        FAILED    = 3, '실패'
+
+    user    = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    items   = models.JSONField()
+    state   = models.IntegerField(choices=State.choices, default=State.PENDING)
+    message = models.CharField(max_length=50, null=True)
+
+    class Meta:
+        db_table = 'pending_orders'
+        indexes  = [
+            models.Index(fields=['state', 'id'], name='pending_orders_state_idx')
+        ]
+
+class UnitSchedule(TimeStampModel):
+    deal          = models.ForeignKey('deals.Deal', on_delete=models.PROTECT)
+    payback_round = models.IntegerField()
+    principal     = models.BigIntegerField()
+    interest      = models.BigIntegerField()
+    payback_date  = models.DateField()
+
+    class Meta:
+        db_table    = 'unit_schedules'
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'payback_round'], name='unique_unit_schedule_round')
+        ]
+        indexes     = [
+            models.Index(fields=['payback_date'], name='unit_schedules_date_idx')
+        ]
+
+class UserInvestmentStatistics(models.Model):
+    user                 = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    status               = models.IntegerField()
+    total_amount         = models.BigIntegerField(default=0)
+    total_interest       = models.BigIntegerField(default=0)
+    total_commission     = models.BigIntegerField(default=0)
+    paid_principal       = models.BigIntegerField(default=0)
+    paid_interest        = models.BigIntegerField(default=0)
+    paid_commission      = models.BigIntegerField(default=0)
+    mortgage_outstanding = models.BigIntegerField(default=0)
+    is_stale             = models.BooleanField(default=False)
+
+    class Meta:
+        db_table    = 'user_investment_statistics'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'status'], name='unique_user_statistics_status')
+        ]
+
+class ExportJob(TimeStampModel):
+    class State(models.IntegerChoices):
+        PENDING   = 1, '접수'
+        RUNNING   = 2, '생성중'
+        COMPLETED = 3, '완료'
+        FAILED    = 4, '실패'
+
+    user      = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    format    = models.CharField(max_length=10)
+    since     = models.DateTimeField(null=True)
+    state     = models.IntegerField(choices=State.choices, default=State.PENDING)
+    file_path = models.CharField(max_length=200, null=True)
+    row_count = models.IntegerField(default=0)
+    message   = models.CharField(max_length=50, null=True)
+    is_stale  = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'export_jobs'
+        indexes  = [
+            models.Index(fields=['state', 'id'], name='export_jobs_state_idx'),
+            models.Index(fields=['user', 'format', 'is_stale'], name='export_jobs_user_idx')
+        ]
@@ -0,0 +1,139 @@
+import logging
+
+from django.db        import transaction, IntegrityError
+from django.db.models import Q, F, Case, When, Value
+from django.utils     import timezone
+
+from deals.models            import Deal
+from deals.utils             import add_platform_statistics, bump_listing_version
+from investments.models      import PaybackSchedule, UserDeal, PendingOrder
+from investments.utils       import get_invested_deals, expire_invested_deals
+from investments.schedules   import load_schedules
+from investments.statistics  import add_investment_statistics
+from investments.export_jobs import expire_export_jobs
+from users.models            import User
+
+ORDER_BATCH_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+class OrderError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+def clean_items(items):
+    if not isinstance(items, list) or not items:
+        raise OrderError('KEY_ERROR')
+
+    if not all(isinstance(item, dict) and {'id', 'amount'} <= item.keys() for item in items):
+        raise OrderError('KEY_ERROR')
+
+    if not all(type(item['id']) is int for item in items):
+        raise OrderError('KEY_ERROR')
+
+    if not all(type(item['amount']) is int for item in items):
+        raise OrderError('INVALID_OPTION')
+
+    return [{'id': item['id'], 'amount': item['amount']} for item in items]
+
+def validate_order(user, items):
+    amounts = {item['id']: item['amount'] for item in clean_items(items)}
+
+    if len(amounts) != len(items) or amounts.keys() & get_invested_deals(user):
+        raise OrderError('INVESTD_DEAL')
+
+    deals = Deal.objects.filter(id__in=list(amounts), status=Deal.Status.APPLYING.value)
+
+    if deals.count() != len(amounts):
+        raise OrderError('INVALID_DEAL')
+
+    if min(amounts.values()) < PaybackSchedule.Option.OPTION_1:
+        raise OrderError('INVALID_OPTION')
+
+    if not all(load_schedules(amounts.items()).values()):
+        raise OrderError('INVALID_OPTION')
+
+    return amounts
+
+def reserve_capacity(amounts):
+    capacity = Q()
+    for deal_id, amount in amounts.items():
+        capacity |= Q(id=deal_id, funded_amount__lte=F('net_amount') - amount)
+
+    reserved = Deal.objects.filter(capacity).order_by('id').update(
+        funded_amount  = F('funded_amount') + Case(
+            *[When(id=deal_id, then=Value(amount)) for deal_id, amount in amounts.items()]
+        ),
+        investor_count = F('investor_count') + 1
+    )
+
+    if reserved != len(amounts):
+        raise OrderError('EXCEEDED_AMOUNT')
+
+def create_investments(user, amounts):
+    with transaction.atomic():
+        reserve_capacity(amounts)
+        UserDeal.objects.bulk_create([
+            UserDeal(
+                user         = user,
+                deal_id      = deal_id,
+                amount       = amount,
+                payback_mode = UserDeal.PaybackMode.DERIVED.value
+            ) for deal_id, amount in amounts.items()
+        ])
+
+        invested_amount = sum(amounts.values())
+        transaction.on_commit(
+            lambda: add_platform_statistics(invested_amount=invested_amount, investment_count=len(amounts))
+        )
+        transaction.on_commit(bump_listing_version)
+
+        expire_invested_deals(user.id)
+        transaction.on_commit(lambda: expire_invested_deals(user.id))
+        add_investment_statistics(user, amounts)
+        expire_export_jobs(user_ids=[user.id])
+
+def submit_order(user, items):
+    items = clean_items(items)
+
+    if {item['id'] for item in items} & get_invested_deals(user):
+        raise OrderError('INVESTD_DEAL')
+
+    return PendingOrder.objects.create(user=user, items=items)
+
+def process_order():
+    with transaction.atomic():
+        order = PendingOrder.objects.select_for_update(skip_locked=True)\
+            .filter(state=PendingOrder.State.PENDING.value).order_by('id').first()
+
+        if order is None:
+            return None
+
+        try:
+            with transaction.atomic():
+                user = User.objects.get(id=order.user_id)
+                create_investments(user, validate_order(user, order.items))
+            order.state, order.message = PendingOrder.State.COMPLETED.value, 'SUCCESS'
+
+        except OrderError as error:
+            order.state, order.message = PendingOrder.State.FAILED.value, error.message
+
+        except IntegrityError:
+            order.state, order.message = PendingOrder.State.FAILED.value, 'INVESTD_DEAL'
+
+        except Exception:
+            logger.exception('pending order %s failed', order.id)
+            order.state, order.message = PendingOrder.State.FAILED.value, 'UNKNOWN_ERROR'
+
+        order.save(update_fields=['state', 'message', 'updated_at'])
+
+    return order
+
+def process_orders(batch_size=ORDER_BATCH_SIZE):
+    processed = 0
+
+    while processed < batch_size and process_order():
+        processed += 1
+
+    return processed
@@ -0,0 +1,89 @@
+from collections import Counter, defaultdict
+
+from django.db.models           import F, Sum, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils               import timezone
+
+from investments.models    import UserDeal, UserPayback
+from investments.schedules import load_schedules
+
+def derive_payback(user_deal, schedule, today):
+    if schedule.payback_round <= user_deal.paid_round:
+        state = UserPayback.State.PAID.value
+    elif schedule.payback_date < today:
+        state = UserPayback.State.UNPAID.value
+    else:
+        state = UserPayback.State.TOBE_PAID.value
+
+    return UserPayback(
+        users_deals   = user_deal,
+        principal     = schedule.principal,
+        interest      = schedule.interest,
+        tax           = schedule.tax,
+        commission    = schedule.commission,
+        payback_round = schedule.payback_round,
+        state         = state,
+        payback_date  = schedule.payback_date
+    )
+
+def resolve_paybacks(user_deals):
+    today      = timezone.localdate()
+    user_deals = list(user_deals)
+    derived    = [user_deal for user_deal in user_deals if user_deal.payback_mode == UserDeal.PaybackMode.DERIVED]
+
+    stored = defaultdict(list)
+    if user_deals:
+        for payback in UserPayback.objects.filter(users_deals__in=user_deals).order_by('payback_round', 'id'):
+            stored[payback.users_deals_id].append(payback)
+
+    schedules = load_schedules((user_deal.deal_id, user_deal.amount) for user_deal in derived) if derived else {}
+
+    for user_deal in user_deals:
+        paybacks = stored[user_deal.id]
+
+        if user_deal.payback_mode == UserDeal.PaybackMode.DERIVED:
+            overrides = {payback.payback_round: payback for payback in paybacks}
+            paybacks  = [
+                overrides.pop(schedule.payback_round, None) or derive_payback(user_deal, schedule, today)
+                for schedule in schedules[(user_deal.deal_id, user_deal.amount)]
+            ] + list(overrides.values())
+
+        user_deal.paybacks      = paybacks
+        user_deal.paid_paybacks = [payback for payback in paybacks if payback.state == UserPayback.State.PAID]
+
+    return user_deals
+
+def paid_totals(user_deals):
+    paid   = UserPayback.objects.filter(users_deals=OuterRef('pk'), state=UserPayback.State.PAID.value)\
+        .order_by().values('users_deals')
+    totals = user_deals.annotate(
+        paid_principal = Subquery(paid.annotate(total=Sum('principal')).values('total')),
+        paid_interest  = Subquery(paid.annotate(total=Sum('interest')).values('total'))
+    ).aggregate(
+        amount    = Coalesce(Sum('amount'), 0),
+        principal = Coalesce(Sum('paid_principal'), 0),
+        interest  = Coalesce(Sum('paid_interest'), 0)
+    )
+
+    derived = user_deals.filter(payback_mode=UserDeal.PaybackMode.DERIVED.value, paid_round__gt=0)
+    groups  = list(derived.values('deal_id', 'amount', 'paid_round').annotate(holders=Count('id')).order_by())
+
+    if not groups:
+        return totals
+
+    overridden = Counter(
+        UserPayback.objects.filter(users_deals__in=derived, payback_round__lte=F('users_deals__paid_round'))\
+            .values_list('users_deals__deal_id', 'users_deals__amount', 'users_deals__paid_round', 'payback_round')
+    )
+    schedules  = load_schedules((group['deal_id'], group['amount']) for group in groups)
+
+    for group in groups:
+        for schedule in schedules[(group['deal_id'], group['amount'])]:
+            if schedule.payback_round > group['paid_round']:
+                break
+
+            holders = group['holders'] - overridden[(group['deal_id'], group['amount'], group['paid_round'], schedule.payback_round)]
+            totals['principal'] += schedule.principal * holders
+            totals['interest']  += schedule.interest * holders
+
+    return totals
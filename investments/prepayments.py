@@ -0,0 +1,103 @@
+from django.db        import transaction
+from django.db.models import F, Max, Case, When, Value
+from django.utils     import timezone
+
+from investments.models     import UserDeal, UserPayback, UnitSchedule
+from investments.schedules  import UNIT_AMOUNT, bump_schedule_version, expand_units
+from investments.statistics import mark_investments_changed
+
+PREPAYMENT_CHUNK_SIZE = 2000
+PAYBACK_FIELDS        = ['principal', 'interest', 'tax', 'commission']
+
+class PrepaymentError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+def reschedule_units(units, index, deal_outstanding, amount):
+    repaid      = units[index - 1].principal if index else 0
+    outstanding = UNIT_AMOUNT - repaid
+
+    if amount is None or deal_outstanding <= 0 or amount >= deal_outstanding:
+        prepaid = outstanding
+    else:
+        prepaid = outstanding * amount // deal_outstanding
+
+    for unit in units[index:]:
+        unit.principal = repaid + prepaid + (unit.principal - repaid) * (outstanding - prepaid) // outstanding
+
+    return prepaid == outstanding
+
+def prepay_deal(deal, payback_round, amount=None, chunk_size=PREPAYMENT_CHUNK_SIZE):
+    units  = list(UnitSchedule.objects.filter(deal=deal).order_by('payback_round'))
+    rounds = [unit.payback_round for unit in units]
+
+    if not units:
+        raise PrepaymentError('UNIT_SCHEDULE_REQUIRED')
+
+    if payback_round not in rounds:
+        raise PrepaymentError('INVALID_ROUND')
+
+    paid_round = UserDeal.objects.filter(deal=deal).aggregate(paid_round=Max('paid_round'))['paid_round'] or 0
+    paid       = UserPayback.objects.filter(
+        users_deals__deal  = deal,
+        payback_round__gte = payback_round,
+        state              = UserPayback.State.PAID.value
+    )
+
+    if payback_round <= paid_round or paid.exists():
+        raise PrepaymentError('PAID_ROUND')
+
+    index            = rounds.index(payback_round)
+    deal_outstanding = deal.funded_amount - deal.funded_amount * (units[index - 1].principal if index else 0) // UNIT_AMOUNT
+    terminated       = reschedule_units(units, index, deal_outstanding, amount)
+    remaining        = units[:index + 1] if terminated else units
+
+    amounts  = list(
+        UserDeal.objects.filter(deal=deal, payback_mode=UserDeal.PaybackMode.MATERIALIZED.value)\
+            .values_list('amount', flat=True).order_by().distinct()
+    )
+    expanded = expand_units(deal.id, remaining, amounts) if amounts else {}
+
+    updated = 0
+    with transaction.atomic():
+        for unit in units[index:]:
+            unit.updated_at = timezone.now()
+
+        UnitSchedule.objects.bulk_update(units[index:], ['principal', 'updated_at'])
+
+        if terminated:
+            UnitSchedule.objects.filter(deal=deal, payback_round__gt=payback_round).delete()
+
+        for payback_amount, schedules in expanded.items():
+            future = [schedule for schedule in schedules if schedule.payback_round >= payback_round]
+            values = {
+                field: Case(
+                    *[When(payback_round=schedule.payback_round, then=Value(getattr(schedule, field))) for schedule in future],
+                    default=F(field)
+                ) for field in PAYBACK_FIELDS
+            }
+            user_deal_ids = list(
+                UserDeal.objects.filter(
+                    deal         = deal,
+                    amount       = payback_amount,
+                    payback_mode = UserDeal.PaybackMode.MATERIALIZED.value
+                ).order_by('id').values_list('id', flat=True)
+            )
+
+            for offset in range(0, len(user_deal_ids), chunk_size):
+                pending = UserPayback.objects.filter(
+                    users_deals_id__in = user_deal_ids[offset:offset + chunk_size],
+                    payback_round__gte = payback_round
+                ).exclude(state=UserPayback.State.PAID.value)
+
+                if terminated:
+                    pending.filter(payback_round__gt=payback_round).delete()
+
+                updated += pending.update(updated_at=timezone.now(), **values)
+
+        bump_schedule_version(deal.id)
+
+    mark_investments_changed(deal_id=deal.id)
+
+    return updated, terminated
@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+import numpy as np
+
+from django.db        import transaction
+from django.db.models import F, Sum, Max, OuterRef, Subquery
+from django.utils     import timezone
+
+from deals.models           import Deal
+from deals.rollups          import lower_rollup_watermark
+from investments.models     import UserDeal, UserPayback
+from investments.schedules  import TAX_RATE, COMMISSION_RATE, load_schedules
+from investments.statistics import mark_investments_changed
+from users.models           import User
+
+RECOVERABLE_STATUSES = [Deal.Status.NONPERFORM.value, Deal.Status.NONPERFORM_COMPLETION.value]
+RECOVERY_BATCH_SIZE  = 1000
+
+class RecoveryError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+def outstanding_principals(deal):
+    user_deals = list(
+        UserDeal.objects.filter(deal=deal).order_by('id').values_list('id', 'user_id', 'amount', 'payback_mode', 'paid_round')
+    )
+    paid = defaultdict(int,
+        UserPayback.objects.filter(users_deals__deal=deal, state=UserPayback.State.PAID.value)\
+            .values('users_deals_id').annotate(paid=Sum('principal')).order_by().values_list('users_deals_id', 'paid')
+    )
+    overridden = set(
+        UserPayback.objects.filter(
+            users_deals__deal         = deal,
+            users_deals__payback_mode = UserDeal.PaybackMode.DERIVED.value,
+            payback_round__lte        = F('users_deals__paid_round')
+        ).values_list('users_deals_id', 'payback_round')
+    )
+
+    derived   = [row for row in user_deals if row[3] == UserDeal.PaybackMode.DERIVED]
+    schedules = load_schedules((deal.id, amount) for _, _, amount, _, _ in derived) if derived else {}
+
+    for user_deal_id, _, amount, _, paid_round in derived:
+        paid[user_deal_id] += sum(
+            schedule.principal for schedule in schedules[(deal.id, amount)]
+            if schedule.payback_round <= paid_round and (user_deal_id, schedule.payback_round) not in overridden
+        )
+
+    ids         = np.array([row[0] for row in user_deals], dtype=np.int64)
+    users       = np.array([row[1] or 0 for row in user_deals], dtype=np.int64)
+    outstanding = np.array([max(row[2] - paid[row[0]], 0) for row in user_deals], dtype=np.int64)
+
+    return ids, users, outstanding
+
+def allocate(amount, weights, ids):
+    total = int(weights.sum())
+    if not total:
+        raise RecoveryError('NO_OUTSTANDING_PRINCIPAL')
+
+    products  = weights.astype(object) * amount
+    shares    = (products // total).astype(np.int64)
+    remainder = (products % total).astype(np.int64)
+    leftover  = amount - int(shares.sum())
+
+    shares[np.lexsort((ids, -remainder))[:leftover]] += 1
+
+    return shares
+
+def distribute_recovery(deal, amount, payback_date=None):
+    if deal.status not in RECOVERABLE_STATUSES:
+        raise RecoveryError('INVALID_DEAL_STATUS')
+
+    payback_date            = payback_date or timezone.localdate()
+    ids, users, outstanding = outstanding_principals(deal)
+    shares                  = allocate(amount, outstanding, ids)
+
+    principal  = np.minimum(shares, outstanding)
+    interest   = shares - principal
+    tax        = interest * TAX_RATE // 100 // 10 * 10
+    commission = interest * COMMISSION_RATE // 100
+    holders    = np.flatnonzero(shares)
+
+    with transaction.atomic():
+        last_round    = UserPayback.objects.filter(users_deals__deal=deal).aggregate(last=Max('payback_round'))['last']
+        payback_round = max(last_round or 0, deal.repayment_period) + 1
+
+        UserPayback.objects.bulk_create([
+            UserPayback(
+                users_deals_id = user_deal_id,
+                principal      = row_principal,
+                interest       = row_interest,
+                tax            = row_tax,
+                commission     = row_commission,
+                payback_round  = payback_round,
+                state          = UserPayback.State.PAID.value,
+                payback_date   = payback_date
+            ) for user_deal_id, row_principal, row_interest, row_tax, row_commission in zip(
+                ids[holders].tolist(),
+                principal[holders].tolist(),
+                interest[holders].tolist(),
+                tax[holders].tolist(),
+                commission[holders].tolist()
+            )
+        ], batch_size=RECOVERY_BATCH_SIZE)
+
+        credits = UserPayback.objects.filter(
+            users_deals__deal = deal,
+            users_deals__user = OuterRef('pk'),
+            payback_round     = payback_round
+        ).order_by().values('users_deals__user').annotate(
+            total = Sum(F('principal') + F('interest') - F('tax') - F('commission'))
+        ).values('total')
+
+        User.objects.filter(id__in=set(users[holders].tolist()) - {0}).update(
+            deposit_amount = F('deposit_amount') + Subquery(credits)
+        )
+
+    lower_rollup_watermark(payback_date)
+    mark_investments_changed(deal_id=deal.id)
+
+    return payback_round, len(holders)
@@ -0,0 +1,216 @@
+from collections import defaultdict
+
+import numpy as np
+
+from django.core.cache import cache
+from django.db         import transaction
+from django.db.models  import F
+
+from deals.models       import Deal
+from investments.models import PaybackSchedule, UnitSchedule
+
+SCHEDULE_KEY         = 'deals:{}:schedule:{}:{}'
+SCHEDULE_TIMEOUT     = 60 * 60 * 24
+UNIT_AMOUNT          = 10 ** 8
+TAX_RATE             = 15
+COMMISSION_RATE      = 15
+# Deal has no field for the balloon share of a MIX(혼합) repayment: half of the principal
+# is repaid at maturity and the other half amortizes like EQUAL_SUM (원리금균등).
+MIX_MATURE_RATIO     = 0.5
+
+def schedule_versions(deal_ids):
+    versions = dict(Deal.objects.filter(id__in=set(deal_ids)).values_list('id', 'schedule_version'))
+
+    return {deal_id: versions.get(deal_id, 0) for deal_id in deal_ids}
+
+def bump_schedule_version(deal_id):
+    Deal.objects.filter(id=deal_id).update(schedule_version=F('schedule_version') + 1)
+
+def principal_ratios(repayment_method, monthly_rate, periods):
+    rounds = np.arange(1, periods + 1)
+    mature = (rounds == periods).astype(np.float64)
+
+    if monthly_rate:
+        equal_sum = ((1 + monthly_rate) ** rounds - 1) / ((1 + monthly_rate) ** periods - 1)
+    else:
+        equal_sum = rounds / periods
+
+    return {
+        Deal.RepaymentMethod.MIX            : MIX_MATURE_RATIO * mature + (1 - MIX_MATURE_RATIO) * equal_sum,
+        Deal.RepaymentMethod.EQUAL_SUM      : equal_sum,
+        Deal.RepaymentMethod.MATURE         : mature,
+        Deal.RepaymentMethod.EQUAL_PRINCIPAL: rounds / periods
+    }[repayment_method]
+
+def unit_schedule(repayment_method, interest_rate, periods):
+    monthly_rate = float(interest_rate) / 100 / 12
+
+    principal = np.floor(UNIT_AMOUNT * principal_ratios(repayment_method, monthly_rate, periods)).astype(np.int64)
+    principal[-1] = UNIT_AMOUNT
+    interest  = np.full(periods, round(monthly_rate * UNIT_AMOUNT), dtype=np.int64)
+
+    return principal, interest
+
+def amortize(amounts, principal_units, interest_units):
+    amounts = np.asarray(amounts, dtype=np.int64)[:, None]
+
+    paid       = amounts * np.asarray(principal_units, dtype=np.int64) // UNIT_AMOUNT
+    balance    = amounts - np.hstack([np.zeros_like(amounts), paid[:, :-1]])
+    principal  = np.diff(paid, prepend=0, axis=1)
+    interest   = balance * np.asarray(interest_units, dtype=np.int64) // UNIT_AMOUNT
+    tax        = interest * TAX_RATE // 100 // 10 * 10
+    commission = interest * COMMISSION_RATE // 100
+
+    return principal, interest, tax, commission
+
+def payback_dates(end_date, repayment_day, periods):
+    months = np.datetime64(end_date, 'M') + np.arange(1, periods + 1)
+    firsts = months.astype('datetime64[D]')
+    length = ((months + 1).astype('datetime64[D]') - firsts).astype(np.int64)
+
+    return (firsts + np.minimum(repayment_day, length) - 1).tolist()
+
+def expand_units(deal_id, units, amounts):
+    principal, interest, tax, commission = (matrix.tolist() for matrix in amortize(
+        amounts,
+        [unit.principal for unit in units],
+        [unit.interest for unit in units]
+    ))
+
+    return {
+        amount: [
+            PaybackSchedule(
+                deal_id       = deal_id,
+                option        = amount,
+                principal     = principal[i][k],
+                interest      = interest[i][k],
+                tax           = tax[i][k],
+                commission    = commission[i][k],
+                payback_round = unit.payback_round,
+                payback_date  = unit.payback_date
+            ) for k, unit in enumerate(units)
+        ] for i, amount in enumerate(amounts)
+    }
+
+def build_units(deal):
+    dates = payback_dates(deal.end_date, deal.repayment_day, deal.repayment_period)
+
+    principal, interest = (array.tolist() for array in unit_schedule(
+        deal.repayment_method, deal.interest_rate, deal.repayment_period
+    ))
+
+    return [
+        UnitSchedule(
+            deal_id       = deal.id,
+            payback_round = k + 1,
+            principal     = principal[k],
+            interest      = interest[k],
+            payback_date  = payback_date
+        ) for k, payback_date in enumerate(dates)
+    ]
+
+def fetch_schedules(pairs):
+    pairs     = set(pairs)
+    schedules = {pair: [] for pair in pairs}
+
+    units = defaultdict(list)
+    for unit in UnitSchedule.objects.filter(deal_id__in={deal_id for deal_id, _ in pairs}).order_by('payback_round'):
+        units[unit.deal_id].append(unit)
+
+    amounts = defaultdict(list)
+    for deal_id, amount in pairs:
+        amounts[deal_id].append(amount)
+
+    for deal_id in units:
+        for amount, rows in expand_units(deal_id, units[deal_id], amounts[deal_id]).items():
+            schedules[(deal_id, amount)] = rows
+
+    legacy = {(deal_id, amount) for deal_id, amount in pairs if deal_id not in units}
+    if legacy:
+        for schedule in PaybackSchedule.objects.filter(
+            deal_id__in = {deal_id for deal_id, _ in legacy},
+            option__in  = {amount for _, amount in legacy}
+        ).order_by('payback_round'):
+            if (schedule.deal_id, schedule.option) in legacy:
+                schedules[(schedule.deal_id, schedule.option)].append(schedule)
+
+    return schedules
+
+def load_schedules(pairs, versions=None):
+    pairs     = set(pairs)
+    versions  = versions or schedule_versions({deal_id for deal_id, _ in pairs})
+    keys      = {pair: SCHEDULE_KEY.format(pair[0], versions[pair[0]], pair[1]) for pair in pairs}
+    cached    = cache.get_many(keys.values())
+    schedules = {pair: cached[key] for pair, key in keys.items() if key in cached}
+    missing   = keys.keys() - schedules.keys()
+
+    if missing:
+        fetched = fetch_schedules(missing)
+        cache.set_many({keys[pair]: rows for pair, rows in fetched.items()}, SCHEDULE_TIMEOUT)
+        schedules.update(fetched)
+
+    return schedules
+
+def expand_schedule(deal_id, amount):
+    return load_schedules([(deal_id, amount)])[(deal_id, amount)]
+
+def get_option_summaries(deal):
+    key       = f'deals:{deal.id}:payback-options:{deal.schedule_version}'
+    summaries = cache.get(key)
+
+    if summaries is None:
+        pairs     = [(deal.id, option) for option in PaybackSchedule.Option.values]
+        schedules = load_schedules(pairs, versions={deal.id: deal.schedule_version})
+        summaries = {}
+
+        for option in PaybackSchedule.Option.values:
+            rounds = schedules[(deal.id, option)]
+
+            if not rounds:
+                continue
+
+            interest   = sum(schedule.interest for schedule in rounds)
+            tax        = sum(schedule.tax for schedule in rounds)
+            commission = sum(schedule.commission for schedule in rounds)
+
+            summaries[option] = {
+                'realityPrice': option + interest - tax - commission,
+                'tax'         : tax,
+                'interest'    : interest,
+                'commission'  : commission
+            }
+        cache.set(key, summaries, SCHEDULE_TIMEOUT)
+
+    return summaries
+
+def publish_schedules(deal):
+    units = build_units(deal)
+
+    with transaction.atomic():
+        PaybackSchedule.objects.filter(deal_id=deal.id).delete()
+        UnitSchedule.objects.filter(deal_id=deal.id).delete()
+        UnitSchedule.objects.bulk_create(units)
+        bump_schedule_version(deal.id)
+
+    return len(units)
+
+def verify_schedules(deal):
+    fields   = ['principal', 'interest', 'tax', 'commission', 'payback_date']
+    options  = PaybackSchedule.Option.values
+    expected = expand_units(deal.id, build_units(deal), options)
+    stored   = fetch_schedules((deal.id, option) for option in options)
+
+    diffs = []
+    for option in options:
+        generated = {schedule.payback_round: schedule for schedule in expected[option]}
+        saved     = {schedule.payback_round: schedule for schedule in stored[(deal.id, option)]}
+
+        for payback_round in sorted(generated.keys() | saved.keys()):
+            for field in fields:
+                generated_value = getattr(generated.get(payback_round), field, None)
+                saved_value     = getattr(saved.get(payback_round), field, None)
+
+                if generated_value != saved_value:
+                    diffs.append((option, payback_round, field, saved_value, generated_value))
+
+    return diffs
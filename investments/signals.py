@@ -0,0 +1,99 @@
+from django.db                import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch          import receiver
+
+from deals.models            import Deal
+from deals.signals           import deal_status_changed
+from deals.utils             import add_deal_funding, add_loan_amount, add_platform_statistics
+from investments.models      import UserDeal, UserPayback
+from investments.utils       import expire_invested_deals
+from investments.export_jobs import expire_export_jobs
+from investments.statistics  import add_payback_statistics, add_user_deal_statistics, mark_investments_changed
+
+@receiver(post_save, sender=UserDeal)
+def add_funding(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    if instance.deal_id:
+        add_deal_funding(instance.deal_id, instance.amount)
+        add_loan_amount(instance.deal_id, instance.amount)
+
+    add_platform_statistics(invested_amount=instance.amount, investment_count=1)
+
+@receiver(post_delete, sender=UserDeal)
+def remove_funding(sender, instance, **kwargs):
+    if instance.deal_id:
+        add_deal_funding(instance.deal_id, -instance.amount, investors=-1)
+        add_loan_amount(instance.deal_id, -instance.amount)
+
+    add_platform_statistics(invested_amount=-instance.amount, investment_count=-1)
+
+@receiver(post_save, sender=UserDeal)
+@receiver(post_delete, sender=UserDeal)
+def expire_user_invested_deals(sender, instance, **kwargs):
+    if instance.user_id:
+        expire_invested_deals(instance.user_id)
+        transaction.on_commit(lambda: expire_invested_deals(instance.user_id))
+
+@receiver(post_save, sender=UserDeal)
+def update_user_statistics(sender, instance, created, **kwargs):
+    if not instance.user_id:
+        return
+
+    if created and instance.deal_id:
+        add_user_deal_statistics(instance)
+        expire_export_jobs(user_ids=[instance.user_id])
+
+    else:
+        mark_investments_changed(user_ids=[instance.user_id])
+
+@receiver(post_delete, sender=UserDeal)
+def remove_user_statistics(sender, instance, **kwargs):
+    if not instance.user_id:
+        return
+
+    if instance.deal_id:
+        add_user_deal_statistics(instance, sign=-1)
+
+    expire_export_jobs(user_ids=[instance.user_id])
+
+def payback_user_deal(payback):
+    return UserDeal.objects.select_related('deal').filter(id=payback.users_deals_id, user__isnull=False).first()
+
+@receiver(post_save, sender=UserPayback)
+def update_payback_statistics(sender, instance, created, **kwargs):
+    user_deal = payback_user_deal(instance)
+
+    if not user_deal:
+        return
+
+    if created and user_deal.deal and user_deal.payback_mode == UserDeal.PaybackMode.MATERIALIZED:
+        add_payback_statistics(user_deal, instance)
+        expire_export_jobs(user_ids=[user_deal.user_id])
+
+    else:
+        mark_investments_changed(user_ids=[user_deal.user_id])
+
+@receiver(post_delete, sender=UserPayback)
+def remove_payback_statistics(sender, instance, **kwargs):
+    user_deal = payback_user_deal(instance)
+
+    if not user_deal:
+        return
+
+    if user_deal.deal and user_deal.payback_mode == UserDeal.PaybackMode.MATERIALIZED:
+        add_payback_statistics(user_deal, instance, sign=-1)
+        expire_export_jobs(user_ids=[user_deal.user_id])
+
+    else:
+        mark_investments_changed(user_ids=[user_deal.user_id])
+
+@receiver(post_save, sender=Deal)
+def expire_deal_statistics(sender, instance, created, **kwargs):
+    if not created:
+        mark_investments_changed(deal_id=instance.id)
+
+@receiver(deal_status_changed)
+def expire_status_exports(sender, deal_id, **kwargs):
+    expire_export_jobs(deal_id=deal_id)
@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from deals.models            import Deal
+from investments.models      import UserDeal, UserPayback, UserInvestmentStatistics
+from investments.paybacks    import resolve_paybacks
+from investments.schedules   import load_schedules
+from investments.export_jobs import expire_export_jobs
+
+STATISTICS_CHUNK_SIZE = 2000
+STATISTICS_FIELDS     = [
+    'total_amount',
+    'total_interest',
+    'total_commission',
+    'paid_principal',
+    'paid_interest',
+    'paid_commission',
+    'mortgage_outstanding'
+]
+
+def mark_statistics_stale(user_ids=None, deal_id=None):
+    statistics = UserInvestmentStatistics.objects.filter(is_stale=False)
+
+    if user_ids is not None:
+        statistics = statistics.filter(user_id__in=user_ids)
+
+    if deal_id is not None:
+        statistics = statistics.filter(user_id__in=UserDeal.objects.filter(deal_id=deal_id).values('user_id'))
+
+    return statistics.update(is_stale=True)
+
+def mark_investments_changed(user_ids=None, deal_id=None):
+    mark_statistics_stale(user_ids=user_ids, deal_id=deal_id)
+    expire_export_jobs(user_ids=user_ids, deal_id=deal_id)
+
+def investment_deltas(deal, amount, paybacks, paid_paybacks):
+    paid_principal = sum(payback.principal for payback in paid_paybacks)
+    outstanding    = sum(payback.principal for payback in paybacks) - paid_principal
+
+    return {
+        'total_amount'        : amount,
+        'total_interest'      : sum(payback.interest for payback in paybacks),
+        'total_commission'    : sum(payback.commission for payback in paybacks),
+        'paid_principal'      : paid_principal,
+        'paid_interest'       : sum(payback.interest for payback in paid_paybacks),
+        'paid_commission'     : sum(payback.commission for payback in paid_paybacks),
+        'mortgage_outstanding': outstanding if deal.category == Deal.Category.MORTGAGE else 0
+    }
+
+def user_deal_deltas(user_deal):
+    return investment_deltas(user_deal.deal, user_deal.amount, user_deal.paybacks, user_deal.paid_paybacks)
+
+def apply_statistics(deltas):
+    deltas = {key: fields for key, fields in deltas.items() if any(fields.values())}
+
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        UserInvestmentStatistics.objects.bulk_create([
+            UserInvestmentStatistics(user_id=user_id, status=status) for user_id, status in deltas
+        ], ignore_conflicts=True)
+
+        rows = [
+            row for row in UserInvestmentStatistics.objects.select_for_update().filter(
+                user_id__in = {user_id for user_id, _ in deltas},
+                status__in  = {status for _, status in deltas}
+            ).order_by('user_id', 'status') if (row.user_id, row.status) in deltas
+        ]
+
+        for row in rows:
+            for field, delta in deltas[(row.user_id, row.status)].items():
+                setattr(row, field, getattr(row, field) + delta)
+
+        UserInvestmentStatistics.objects.bulk_update(rows, STATISTICS_FIELDS)
+
+    return len(rows)
+
+def add_user_deal_statistics(user_deal, sign=1):
+    user_deal, = resolve_paybacks([user_deal])
+
+    apply_statistics({
+        (user_deal.user_id, user_deal.deal.status): {
+            field: sign * delta for field, delta in user_deal_deltas(user_deal).items()
+        }
+    })
+
+def add_payback_statistics(user_deal, payback, sign=1):
+    paid   = [payback] if payback.state == UserPayback.State.PAID else []
+    deltas = investment_deltas(user_deal.deal, 0, [payback], paid)
+
+    apply_statistics({
+        (user_deal.user_id, user_deal.deal.status): {field: sign * delta for field, delta in deltas.items()}
+    })
+
+def add_investment_statistics(user, amounts):
+    deals     = Deal.objects.in_bulk(list(amounts))
+    schedules = load_schedules(amounts.items(), versions={deal.id: deal.schedule_version for deal in deals.values()})
+    deltas    = defaultdict(Counter)
+
+    for deal_id, amount in amounts.items():
+        deal = deals[deal_id]
+        deltas[(user.id, deal.status)].update(investment_deltas(deal, amount, schedules[(deal_id, amount)], []))
+
+    apply_statistics(deltas)
+
+def add_paid_statistics(deal, paid):
+    apply_statistics({
+        (user_id, deal.status): {
+            'paid_principal'      : principal,
+            'paid_interest'       : interest,
+            'paid_commission'     : commission,
+            'mortgage_outstanding': -principal if deal.category == Deal.Category.MORTGAGE else 0
+        } for user_id, (principal, interest, commission) in paid.items()
+    })
+
+def move_deal_statistics(deal_id, previous, status, chunk_size=STATISTICS_CHUNK_SIZE):
+    holders = UserDeal.objects.filter(deal_id=deal_id, user__isnull=False).select_related('deal').order_by('id')
+
+    last_id, moved = 0, 0
+    while True:
+        chunk = resolve_paybacks(holders.filter(id__gt=last_id)[:chunk_size])
+
+        if not chunk:
+            break
+
+        deltas = defaultdict(Counter)
+        for user_deal in chunk:
+            contribution = user_deal_deltas(user_deal)
+            deltas[(user_deal.user_id, previous)].subtract(contribution)
+            deltas[(user_deal.user_id, status)].update(contribution)
+
+        apply_statistics(deltas)
+
+        last_id  = chunk[-1].id
+        moved   += len(chunk)
+
+    return moved
+
+def rebuild_user_statistics(user):
+    with transaction.atomic():
+        UserInvestmentStatistics.objects.bulk_create([
+            UserInvestmentStatistics(user=user, status=status) for status in Deal.Status.values
+        ], ignore_conflicts=True)
+
+        rows   = list(UserInvestmentStatistics.objects.filter(user=user).select_for_update().order_by('status'))
+        totals = defaultdict(Counter)
+
+        for user_deal in resolve_paybacks(UserDeal.objects.filter(user=user, deal__isnull=False).select_related('deal')):
+            totals[user_deal.deal.status].update(user_deal_deltas(user_deal))
+
+        for row in rows:
+            for field in STATISTICS_FIELDS:
+                setattr(row, field, totals[row.status][field])
+            row.is_stale = False
+
+        UserInvestmentStatistics.objects.bulk_update(rows, STATISTICS_FIELDS + ['is_stale'])
+
+    return rows
+
+def get_user_statistics(user):
+    rows = {row.status: row for row in UserInvestmentStatistics.objects.filter(user=user)}
+
+    return {
+        status.name: rows.get(status.value) or UserInvestmentStatistics(user=user, status=status.value)
+        for status in Deal.Status
+    }
@@ -1,14 +1,41 @@
+import csv
 import json
+import zipfile
+import tempfile
 import unittest
 import bcrypt, jwt
-from datetime   import datetime, timedelta
-
-from django.test import TestCase, Client
-
-from users.models       import Bank, User
-from deals.models       import Debtor, Deal, Mortgage, MortgageImage
-from investments.models import PaybackSchedule, UserDeal, UserPayback
-from my_settings        import SECRET_KEY, ALGORITHM
+import numpy as np
+from io            import StringIO, BytesIO
+from datetime      import datetime, timedelta
+from unittest.mock import patch
+
+from django.test            import TestCase, Client
+from django.core.cache      import cache
+from django.core.management import call_command, CommandError
+from django.utils           import timezone
+
+from users.models            import Bank, User
+from deals.models            import Debtor, Deal, Mortgage, MortgageImage
+from deals.rollups           import derived_repayments
+from investments.models      import PaybackSchedule, UserDeal, UserPayback, UnitSchedule, UserInvestmentStatistics, ExportJob, PendingOrder
+from investments.schedules   import publish_schedules, verify_schedules, expand_schedule
+from investments.paybacks    import resolve_paybacks
+from investments.export_jobs import ExportError, process_export_jobs, submit_export
+from investments.recoveries  import allocate
+from investments.orders      import process_orders
+from investments.statistics  import STATISTICS_FIELDS
+from investments.exports     import export_rows
+from my_settings             import SECRET_KEY, ALGORITHM
+
+class StatisticsAssertions:
+    def assertStatisticsRebuilt(self, user_id):
+        fields = ['status'] + STATISTICS_FIELDS
+        stored = UserInvestmentStatistics.objects.filter(user_id=user_id).values_list(*fields)
+        before = {row for row in stored if any(row[1:])}
+
+        call_command('rebuild_investment_statistics', user_id, stdout=StringIO())
+
+        self.assertEqual({row for row in stored.all() if any(row[1:])}, before)
 
 class InvestmentHistoryTestCase(TestCase):
     @classmethod
@@ -399,6 +426,20 @@ class InvestmentHistoryTestCase(TestCase):
             }
         )
 
+    def test_investment_history_view_page_queries(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+
+        with self.assertNumQueries(6):
+            response = client.get("/investments/history?limit=2", **headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["summary"], {"total": 7800000, "paidTotal": 4681044, "paidInterest": 522414})
+        self.assertEqual(response.json()["count"]["all"], 10)
+        self.assertEqual([item["id"] for item in response.json()["items"]], [10, 9])
+
     def test_investment_history_search_view_success(self):
         client = Client()
 
@@ -736,7 +777,19 @@ class InvestmentPortfolioTestCase(TestCase):
             }
         })
 
-class InvestmentSummaryTestCase(TestCase):
+    def test_investment_portfolio_view_single_aggregate(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+
+        with self.assertNumQueries(2):
+            response = client.get("/investments/portfolio", **headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(response.json()["results"]["grade"]["counts"]), 10)
+
+class InvestmentSummaryTestCase(StatisticsAssertions, TestCase):
     @classmethod
     def setUpTestData(cls):
         Bank.objects.create(
@@ -973,6 +1026,28 @@ class InvestmentSummaryTestCase(TestCase):
             }
         )
 
+    def test_investments_summary_view_statistics_rebuild(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+
+        self.assertStatisticsRebuilt(1)
+
+        with self.assertNumQueries(3):
+            summary = client.get("/investments/summary", **headers).json()
+
+        payback = UserPayback.objects.filter(users_deals__user_id=1).first()
+        payback.save()
+
+        self.assertEqual(UserInvestmentStatistics.objects.filter(user_id=1, is_stale=True).count(), 8)
+        self.assertEqual(client.get("/investments/summary", **headers).json(), summary)
+
+        call_command('rebuild_investment_statistics', '--stale', stdout=StringIO())
+
+        self.assertFalse(UserInvestmentStatistics.objects.filter(user_id=1, is_stale=True).exists())
+        self.assertEqual(client.get("/investments/summary", **headers).json(), summary)
+
 class XlsxExportTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -1184,7 +1259,107 @@ class XlsxExportTestCase(TestCase):
             "attachment;filename*=UTF-8''%5B2021-07-28%5D%20%ED%88%AC%EC%9E%90%20%EB%82%B4%EC%97%AD%20%EB%8B%A4%EC%9A%B4%EB%A1%9C%EB%93%9C.xlsx"
         )
 
-class InvestmentDealTestCase(TestCase):
+    def test_xlsx_export_view_streamed_workbook(self):
+        client   = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        response     = client.get("/investments/export-investment-history-xlsx", **headers)
+
+        self.assertTrue(response.streaming)
+
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+
+        self.assertEqual(sheet.count('<row>'), UserDeal.objects.filter(user_id=1).count() + 1)
+
+    def test_export_rows_keyset_chunks(self):
+        user = User.objects.get(id=1)
+
+        self.assertEqual(
+            [row[1] for row in export_rows(user, chunk_size=3)],
+            list(UserDeal.objects.filter(user=user).order_by('id').values_list('id', flat=True))
+        )
+
+    def test_xlsx_export_view_csv_paid_sums(self):
+        client   = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        response     = client.get("/investments/export-investment-history-xlsx?format=csv", **headers)
+        content      = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows         = list(csv.reader(StringIO(content)))[1:]
+
+        investments = resolve_paybacks(UserDeal.objects.filter(user_id=1).order_by('id'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [[int(value) for value in row[7:]] for row in rows],
+            [
+                [sum(getattr(payback, field) for payback in investment.paid_paybacks) for field in ['principal', 'interest', 'tax', 'commission']]
+                for investment in investments
+            ]
+        )
+
+    def test_export_job_reuse_and_delta(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+
+        with tempfile.TemporaryDirectory() as export_root, self.settings(EXPORT_ROOT=export_root):
+            response = client.post("/investments/exports", json.dumps({"format": "csv"}), content_type="application/json", **headers)
+            export_id = response.json()["results"]["exportId"]
+
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(process_export_jobs(), 1)
+
+            response = client.post("/investments/exports", json.dumps({"format": "csv"}), content_type="application/json", **headers)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["results"], {"exportId": export_id, "state": "COMPLETED"})
+
+            response = client.get(f"/investments/exports/{export_id}/file", **headers)
+            rows     = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+
+            self.assertEqual(len(rows), UserDeal.objects.filter(user_id=1).count() + 1)
+
+            payback = UserPayback.objects.filter(users_deals__user_id=1).first()
+            payback.save()
+
+            response = client.post(
+                "/investments/exports", json.dumps({"format": "csv", "delta": True}), content_type="application/json", **headers
+            )
+            delta_id = response.json()["results"]["exportId"]
+
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(process_export_jobs(), 1)
+            self.assertEqual(ExportJob.objects.get(id=delta_id).row_count, 1)
+            self.assertIsNone(ExportJob.objects.get(id=export_id).file_path)
+
+    def test_export_job_failures_and_abandoned_jobs(self):
+        with tempfile.TemporaryDirectory() as export_root, self.settings(EXPORT_ROOT=export_root):
+            broken    = ExportJob.objects.create(user_id=1, format='pdf')
+            abandoned = ExportJob.objects.create(user_id=1, format='csv', state=ExportJob.State.RUNNING.value)
+            ExportJob.objects.filter(id=abandoned.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+            job, queued = submit_export(User.objects.get(id=1), 'csv')
+
+            self.assertTrue(queued)
+            self.assertNotEqual(job.id, abandoned.id)
+            self.assertEqual(process_export_jobs(), 3)
+
+            broken.refresh_from_db()
+            abandoned.refresh_from_db()
+
+            self.assertEqual((broken.state, broken.message), (ExportJob.State.FAILED, 'UNKNOWN_ERROR'))
+            self.assertEqual(abandoned.state, ExportJob.State.COMPLETED)
+
+    def test_submit_export_invalid_format(self):
+        with self.assertRaisesMessage(ExportError, 'INVALID_FORMAT'):
+            submit_export(User.objects.get(id=1), 'pdf')
+
+class InvestmentDealTestCase(StatisticsAssertions, TestCase):
     @classmethod
     def setUpTestData(cls):
         Bank.objects.create(
@@ -1266,6 +1441,9 @@ class InvestmentDealTestCase(TestCase):
                     payback_date      = payback_date.replace(day=1) + timedelta(days=32)
                     payback_date      = datetime(payback_date.year, payback_date.month, deal.repayment_day).date()
 
+    def setUp(self):
+        cache.clear()
+
     def test_investment_deal_view_success(self):
         client = Client()
 
@@ -1288,6 +1466,131 @@ class InvestmentDealTestCase(TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.json(), {"message": "SUCCESS"})
 
+    def test_investment_deal_view_batch_success(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        options      = {2: 5000, 4: 10000, 6: 20000, 8: 50000, 10: 100000}
+        body         = {"investments": [{"id": deal_id, "amount": amount} for deal_id, amount in options.items()]}
+
+        with self.assertNumQueries(17):
+            response = client.post("/investments", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertStatisticsRebuilt(1)
+        self.assertEqual(
+            list(Deal.objects.filter(id__in=[2, 4]).values_list('funded_amount', 'investor_count')),
+            [(5000, 1), (10000, 1)]
+        )
+        self.assertFalse(UserPayback.objects.filter(users_deals__user_id=1).exists())
+
+        user_deals = UserDeal.objects.filter(user_id=1)
+        user_deals.filter(deal_id=2).update(paid_round=3)
+        UserPayback.objects.create(
+            users_deals   = user_deals.get(deal_id=4),
+            principal     = 0,
+            interest      = 0,
+            tax           = 0,
+            commission    = 0,
+            payback_round = 2,
+            state         = UserPayback.State.UNPAID.value,
+            payback_date  = "2021-10-25"
+        )
+
+        with self.assertNumQueries(3):
+            resolved = {user_deal.deal_id: user_deal for user_deal in resolve_paybacks(user_deals)}
+
+        self.assertEqual([len(resolved[deal_id].paybacks) for deal_id in options], [12] * len(options))
+        self.assertEqual([payback.payback_round for payback in resolved[2].paid_paybacks], [1, 2, 3])
+        self.assertEqual(
+            [payback.state for payback in resolved[4].paybacks[:3]],
+            [UserPayback.State.TOBE_PAID, UserPayback.State.UNPAID, UserPayback.State.TOBE_PAID]
+        )
+
+    def test_investment_deal_view_exceeded_amount_error(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        body         = {"investments": [{"id": 2, "amount": 5000}, {"id": 4, "amount": 5000}]}
+
+        Deal.objects.filter(id=4).update(funded_amount=11996000)
+        response = client.post("/investments", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"message": "EXCEEDED_AMOUNT"})
+        self.assertFalse(UserDeal.objects.filter(user_id=1).exists())
+        self.assertEqual(
+            list(Deal.objects.filter(id__in=[2, 4]).values_list('funded_amount', flat=True)), [0, 11996000]
+        )
+
+    def test_investment_deal_view_async_order_success(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        orders       = [
+            {"investments": [{"id": 2, "amount": 5000}, {"id": 4, "amount": 10000}]},
+            {"investments": [{"id": 6, "amount": 1234}]}
+        ]
+
+        order_ids = []
+        for body in orders:
+            response = client.post("/investments?async=true", json.dumps(body), content_type="application/json", **headers)
+
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["message"], "ACCEPTED")
+            order_ids.append(response.json()["orderId"])
+
+        self.assertFalse(UserDeal.objects.filter(user_id=1).exists())
+        self.assertEqual(client.get(f"/investments/orders/{order_ids[0]}", **headers).json()["results"]["state"], "PENDING")
+
+        call_command('process_investment_orders', stdout=StringIO())
+
+        self.assertEqual(sorted(UserDeal.objects.filter(user_id=1).values_list('deal_id', flat=True)), [2, 4])
+        self.assertEqual(
+            [client.get(f"/investments/orders/{order_id}", **headers).json()["results"] for order_id in order_ids],
+            [
+                {"orderId": order_ids[0], "state": "COMPLETED", "message": "SUCCESS"},
+                {"orderId": order_ids[1], "state": "FAILED", "message": "INVALID_OPTION"}
+            ]
+        )
+
+    def test_investment_deal_view_async_malformed_order(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        body         = {"investments": [{"id": 2, "amount": "5000"}]}
+        response     = client.post("/investments?async=true", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"message": "INVALID_OPTION"})
+
+        poison = PendingOrder.objects.create(user_id=1, items=[{"id": 2, "amount": "5000"}])
+        order  = PendingOrder.objects.create(user_id=1, items=[{"id": 4, "amount": 10000}])
+
+        call_command('process_investment_orders', stdout=StringIO())
+
+        poison.refresh_from_db()
+        order.refresh_from_db()
+
+        self.assertEqual((poison.state, order.state), (PendingOrder.State.FAILED, PendingOrder.State.COMPLETED))
+        self.assertEqual(list(UserDeal.objects.filter(user_id=1).values_list('deal_id', flat=True)), [4])
+
+    def test_process_orders_logs_unexpected_error(self):
+        order = PendingOrder.objects.create(user_id=1, items=[{"id": 4, "amount": 10000}])
+
+        with patch('investments.orders.create_investments', side_effect=RuntimeError), \
+            self.assertLogs('investments.orders', level='ERROR'):
+            self.assertEqual(process_orders(), 1)
+
+        order.refresh_from_db()
+
+        self.assertEqual((order.state, order.message), (PendingOrder.State.FAILED, 'UNKNOWN_ERROR'))
+        self.assertFalse(UserDeal.objects.filter(user_id=1, deal_id=4).exists())
+
     def test_investment_deal_view_invalid_status_deal_error(self):
         client = Client()
 
@@ -1341,3 +1644,305 @@ class InvestmentDealTestCase(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json(), {"message": "INVALID_OPTION"})
+
+    def test_investment_deal_view_malformed_cart_error(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+
+        for investments, message in [
+            ([], "KEY_ERROR"),
+            ([{"id": "2", "amount": 5000}], "KEY_ERROR"),
+            ([{"id": 2, "amount": "5000"}], "INVALID_OPTION")
+        ]:
+            response = client.post(
+                "/investments", json.dumps({"investments": investments}), content_type="application/json", **headers
+            )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"message": message})
+
+    def test_investment_deal_view_invested_deal_error(self):
+        client = Client()
+
+        access_token = jwt.encode({"user_id": 1}, SECRET_KEY, ALGORITHM)
+        headers      = {'HTTP_AUTHORIZATION': access_token}
+        body         = {
+            "investments": [
+                {
+                    "id": 2,
+                    "amount": 5000
+                }
+            ]
+        }
+        response = client.post("/investments", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(2):
+            response = client.post("/investments", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"message": "INVESTD_DEAL"})
+
+        with self.assertNumQueries(1):
+            response = client.post("/investments", json.dumps(body), content_type="application/json", **headers)
+
+        self.assertEqual(response.json(), {"message": "INVESTD_DEAL"})
+
+class PaybackScheduleEngineTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Debtor.objects.create(
+            id         = 1,
+            name       = "debtor_1",
+            birth_date = "2020-01-01"
+        )
+
+        for method in Deal.RepaymentMethod.values:
+            Deal.objects.create(
+                id               = method,
+                name             = f"deal_{method}",
+                category         = 1,
+                grade            = 1,
+                earning_rate     = 8.5,
+                interest_rate    = 8.5,
+                repayment_period = 36,
+                repayment_method = method,
+                net_amount       = 100000000,
+                repayment_day    = 31,
+                start_date       = "2021-01-01",
+                end_date         = "2021-01-15",
+                reason           = f"reason_{method}",
+                debtor_id        = 1,
+                status           = 1
+            )
+
+    def test_publish_schedules_success(self):
+        for deal in Deal.objects.all():
+            self.assertEqual(publish_schedules(deal), 36)
+            self.assertEqual(verify_schedules(deal), [])
+            self.assertFalse(PaybackSchedule.objects.filter(deal=deal).exists())
+
+            for option in PaybackSchedule.Option.values + [123456]:
+                self.assertEqual(sum(schedule.principal for schedule in expand_schedule(deal.id, option)), option)
+
+        self.assertEqual(
+            [
+                (schedule.principal, schedule.interest, schedule.tax, schedule.commission, schedule.payback_date)
+                for schedule in expand_schedule(2, 10000000)[:2]
+            ],
+            [(244842, 70833, 10620, 10624, datetime(2021, 2, 28).date()), (246576, 69099, 10360, 10364, datetime(2021, 3, 31).date())]
+        )
+
+    def test_schedule_cache_follows_schedule_version(self):
+        deal = Deal.objects.get(id=Deal.RepaymentMethod.EQUAL_PRINCIPAL)
+        publish_schedules(deal)
+        expand_schedule(deal.id, 10000)
+
+        deal.interest_rate = 0
+        publish_schedules(deal)
+
+        self.assertEqual(Deal.objects.get(id=deal.id).schedule_version, 2)
+        self.assertEqual(sum(schedule.interest for schedule in expand_schedule(deal.id, 10000)), 0)
+
+    def test_mix_schedule_half_balloon(self):
+        publish_schedules(Deal.objects.get(id=Deal.RepaymentMethod.MIX))
+
+        schedules = expand_schedule(Deal.RepaymentMethod.MIX, 10000000)
+
+        self.assertEqual(
+            [
+                (schedule.principal, schedule.interest, schedule.tax, schedule.commission)
+                for schedule in schedules[:2] + schedules[-1:]
+            ],
+            [(122421, 70833, 10620, 10624), (123288, 69966, 10490, 10494), (5156728, 36526, 5470, 5478)]
+        )
+
+    def test_verify_schedules_difference(self):
+        deal = Deal.objects.get(id=3)
+        publish_schedules(deal)
+        UnitSchedule.objects.filter(deal=deal, payback_round=1).update(payback_date="2021-02-01")
+
+        diffs = verify_schedules(deal)
+
+        self.assertEqual(len(diffs), len(PaybackSchedule.Option.values))
+        self.assertEqual(diffs[0], (5000, 1, 'payback_date', datetime(2021, 2, 1).date(), datetime(2021, 2, 28).date()))
+
+class DisbursementTestCase(StatisticsAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Bank.objects.create(
+            id   = 1,
+            name = "농협은행"
+        )
+
+        for i in [1, 2]:
+            User.objects.create(
+                id              = i,
+                email           = f"example{i}@gmail.com",
+                deposit_bank_id = 1,
+                deposit_account = f"1234456{i}",
+                deposit_amount  = 0
+            )
+
+        Debtor.objects.create(
+            id         = 1,
+            name       = "debtor_1",
+            birth_date = "2020-01-01"
+        )
+
+        deal = Deal.objects.create(
+            id               = 1,
+            name             = "deal_1",
+            category         = 1,
+            grade            = 1,
+            earning_rate     = 8.5,
+            interest_rate    = 8.5,
+            repayment_period = 6,
+            repayment_method = Deal.RepaymentMethod.EQUAL_PRINCIPAL.value,
+            net_amount       = 100000000,
+            repayment_day    = 25,
+            start_date       = "2021-01-01",
+            end_date         = "2021-01-15",
+            reason           = "reason_1",
+            debtor_id        = 1,
+            status           = Deal.Status.NORMAL.value
+        )
+        publish_schedules(deal)
+
+        UserDeal.objects.create(user_id=1, deal=deal, amount=1000000, payback_mode=UserDeal.PaybackMode.DERIVED.value)
+        user_deal = UserDeal.objects.create(user_id=2, deal=deal, amount=500000)
+        UserPayback.objects.bulk_create([
+            UserPayback(
+                users_deals   = user_deal,
+                principal     = schedule.principal,
+                interest      = schedule.interest,
+                tax           = schedule.tax,
+                commission    = schedule.commission,
+                payback_round = schedule.payback_round,
+                state         = UserPayback.State.TOBE_PAID.value,
+                payback_date  = schedule.payback_date
+            ) for schedule in expand_schedule(1, 500000)
+        ])
+        call_command('rebuild_investment_statistics', stdout=StringIO())
+
+    def test_disburse_paybacks_success(self):
+        for _ in range(2):
+            call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+
+        nets = {
+            amount: sum(
+                schedule.principal + schedule.interest - schedule.tax - schedule.commission
+                for schedule in expand_schedule(1, amount)[:1]
+            ) for amount in [1000000, 500000]
+        }
+
+        self.assertEqual(dict(User.objects.values_list('id', 'deposit_amount')), {1: nets[1000000], 2: nets[500000]})
+        self.assertEqual(UserDeal.objects.get(user_id=1).paid_round, 1)
+        self.assertEqual(
+            list(UserPayback.objects.filter(state=UserPayback.State.PAID.value).values_list('payback_round', flat=True)), [1]
+        )
+        self.assertStatisticsRebuilt(1)
+        self.assertStatisticsRebuilt(2)
+
+        with self.assertRaises(CommandError):
+            call_command('disburse_paybacks', 1, 7, stdout=StringIO())
+
+    def test_disburse_paybacks_out_of_order(self):
+        with self.assertRaisesMessage(CommandError, 'UNPAID_ROUND'):
+            call_command('disburse_paybacks', 1, 2, stdout=StringIO())
+
+        self.assertEqual(list(User.objects.values_list('deposit_amount', flat=True).distinct()), [0])
+        self.assertFalse(UserPayback.objects.filter(state=UserPayback.State.PAID.value).exists())
+
+        call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+        call_command('disburse_paybacks', 1, 2, stdout=StringIO())
+
+        self.assertEqual(UserDeal.objects.get(user_id=1).paid_round, 2)
+
+    def test_derived_repayments_window(self):
+        call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+        schedule = expand_schedule(1, 1000000)[0]
+
+        self.assertEqual(
+            derived_repayments(schedule.payback_date, schedule.payback_date), {schedule.payback_date: schedule.principal}
+        )
+
+        with self.assertNumQueries(2):
+            self.assertEqual(derived_repayments(datetime(2030, 1, 1).date(), datetime(2030, 12, 31).date()), {})
+
+    def test_disburse_overridden_derived_round(self):
+        schedule = expand_schedule(1, 1000000)[0]
+        UserPayback.objects.create(
+            users_deals   = UserDeal.objects.get(user_id=1),
+            principal     = schedule.principal,
+            interest      = schedule.interest,
+            tax           = schedule.tax,
+            commission    = schedule.commission,
+            payback_round = 1,
+            state         = UserPayback.State.TOBE_PAID.value,
+            payback_date  = schedule.payback_date
+        )
+
+        call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+
+        self.assertEqual(UserDeal.objects.get(user_id=1).paid_round, 1)
+        self.assertEqual(UserPayback.objects.filter(state=UserPayback.State.PAID.value).count(), 2)
+
+    def test_prepay_deal_success(self):
+        call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+        before = {amount: expand_schedule(1, amount) for amount in [1000000, 500000]}
+
+        call_command('prepay_deal', 1, 2, '--amount=625000', stdout=StringIO())
+        after = {amount: expand_schedule(1, amount) for amount in [1000000, 500000]}
+
+        for amount in [1000000, 500000]:
+            self.assertEqual(sum(schedule.principal for schedule in after[amount]), amount)
+            self.assertEqual(after[amount][0].principal, before[amount][0].principal)
+            self.assertEqual(after[amount][1].principal, amount // 2)
+            self.assertLess(after[amount][2].interest, before[amount][2].interest)
+
+        self.assertEqual(
+            list(UserPayback.objects.order_by('payback_round').values_list('principal', 'interest', 'tax', 'commission')),
+            [
+                (schedule.principal, schedule.interest, schedule.tax, schedule.commission)
+                for schedule in before[500000][:1] + after[500000][1:]
+            ]
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('prepay_deal', 1, 1, stdout=StringIO())
+
+        call_command('prepay_deal', 1, 3, stdout=StringIO())
+
+        self.assertEqual([len(expand_schedule(1, amount)) for amount in [1000000, 500000]], [3, 3])
+        self.assertEqual(UserPayback.objects.count(), 3)
+        self.assertEqual(sum(UserPayback.objects.values_list('principal', flat=True)), 500000)
+
+    def test_allocate_large_recovery(self):
+        shares = allocate(5 * 10 ** 12, np.array([3 * 10 ** 9, 10 ** 9 + 1]), np.array([1, 2]))
+
+        self.assertEqual(shares.tolist(), [3749999999063, 1250000000937])
+
+    def test_distribute_recovery_success(self):
+        call_command('disburse_paybacks', 1, 1, stdout=StringIO())
+        deposits = dict(User.objects.values_list('id', 'deposit_amount'))
+
+        with self.assertRaises(CommandError):
+            call_command('distribute_recovery', 1, 1000001, stdout=StringIO())
+
+        Deal.objects.filter(id=1).update(status=Deal.Status.NONPERFORM.value)
+        call_command('distribute_recovery', 1, 1000001, '--date=2021-07-28', stdout=StringIO())
+
+        recoveries = dict(UserPayback.objects.filter(payback_round=7).values_list('users_deals__user_id', 'principal'))
+
+        self.assertEqual(sum(recoveries.values()), 1000001)
+        self.assertEqual(recoveries, {1: 666667, 2: 333334})
+        self.assertEqual(
+            dict(User.objects.values_list('id', 'deposit_amount')),
+            {user_id: deposits[user_id] + recovered for user_id, recovered in recoveries.items()}
+        )
+        self.assertEqual(resolve_paybacks(UserDeal.objects.filter(user_id=1))[0].paid_paybacks[-1].principal, 666667)
+
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from investments.views import InvestmentHistoryView, InvestmentPortfolioView, InvestmentSummaryView, XlsxExportView, InvestmentDealView
+from investments.views import InvestmentHistoryView, InvestmentPortfolioView, InvestmentSummaryView, XlsxExportView, InvestmentDealView, InvestmentOrderView, ExportJobView, ExportJobDetailView, ExportJobFileView
 
 
 urlpatterns = [
@@ -9,4 +9,8 @@ urlpatterns = [
     path('/portfolio'                      , InvestmentPortfolioView.as_view()),
     path('/summary'                        , InvestmentSummaryView.as_view()),
     path('/export-investment-history-xlsx' , XlsxExportView.as_view()),
+    path('/orders/<int:order_id>'          , InvestmentOrderView.as_view()),
+    path('/exports'                        , ExportJobView.as_view()),
+    path('/exports/<int:export_id>'        , ExportJobDetailView.as_view()),
+    path('/exports/<int:export_id>/file'   , ExportJobFileView.as_view()),
 ]
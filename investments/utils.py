@@ -1,88 +1,98 @@
-from deals.models   import Deal
+from django.core.cache  import cache
+from django.db.models   import Case, When, Value, Sum, Count, IntegerField
+
+from deals.models       import Deal
+from investments.models import UserDeal
+
+INVESTED_DEALS_KEY     = 'users:{}:invested-deals'
+INVESTED_DEALS_TIMEOUT = 60 * 60
+
+GRADE_BUCKETS = {
+    'a'   : [Deal.Grade.A_PLUS.value, Deal.Grade.A.value, Deal.Grade.A_MINUS.value],
+    'b'   : [Deal.Grade.B_PLUS.value, Deal.Grade.B.value, Deal.Grade.B_MINUS.value],
+    'c'   : [Deal.Grade.C_PLUS.value, Deal.Grade.C.value, Deal.Grade.C_MINUS.value],
+    'd'   : [Deal.Grade.D_PLUS.value, Deal.Grade.D.value, Deal.Grade.D_MINUS.value],
+    'etc' : None
+}
+
+EARNING_RATE_BUCKETS = {
+    'underEight' : 8,
+    'overEight'  : 10,
+    'overTen'    : 12,
+    'overTwelve' : None
+}
+
+CATEGORY_BUCKETS = {
+    'personal' : [Deal.Category.CREDIT.value],
+    'company'  : [Deal.Category.COMPANY.value],
+    'special'  : [Deal.Category.SPECIAL.value],
+    'estate'   : [Deal.Category.MORTGAGE.value],
+    'etc'      : None
+}
+
+def get_invested_deals(user):
+    if not user:
+        return frozenset()
+
+    key      = INVESTED_DEALS_KEY.format(user.id)
+    invested = cache.get(key)
+
+    if invested is None:
+        invested = frozenset(UserDeal.objects.filter(user=user).values_list('deal_id', flat=True))
+        cache.set(key, invested, INVESTED_DEALS_TIMEOUT)
+
+    return invested
+
+def expire_invested_deals(user_id):
+    cache.delete(INVESTED_DEALS_KEY.format(user_id))
+
+def bucket_case(lookup, buckets):
+    bounds  = list(buckets.values())
+    default = bounds.index(None)
+
+    return Case(
+        *[When(**{lookup: bound}, then=Value(index)) for index, bound in enumerate(bounds) if bound is not None],
+        default      = Value(default),
+        output_field = IntegerField()
+    )
 
 class Portfolio:
     def __init__(self):
         self.grade = {
-            'grades'  : ['a', 'b', 'c', 'd', 'etc'],
-            'amounts' : [0, 0, 0, 0, 0],
-            'counts'  : [0, 0, 0, 0, 0]
+            'grades'  : list(GRADE_BUCKETS),
+            'amounts' : [0] * len(GRADE_BUCKETS),
+            'counts'  : [0] * len(GRADE_BUCKETS)
         }
         
         self.earning_rate = {
-            'earningRates' : ["underEight", "overEight", "overTen", "overTwelve"],
-            'amounts'      : [0, 0, 0, 0],
-            'counts'       : [0, 0, 0, 0]
+            'earningRates' : list(EARNING_RATE_BUCKETS),
+            'amounts'      : [0] * len(EARNING_RATE_BUCKETS),
+            'counts'       : [0] * len(EARNING_RATE_BUCKETS)
         }
 
         self.category = {
-            "categories" : ["personal", "company", "special", "estate", "etc"],
-            'amounts'    : [0, 0, 0, 0, 0],
-            'counts'     : [0, 0, 0, 0, 0]
+            "categories" : list(CATEGORY_BUCKETS),
+            'amounts'    : [0] * len(CATEGORY_BUCKETS),
+            'counts'     : [0] * len(CATEGORY_BUCKETS)
         }
 
-    def sort_deal(self, user_deal):
-        self._set_by_grade(user_deal)
-        self._set_by_earning_rate(user_deal)
-        self._set_by_categry(user_deal)
-
-    def _set_by_grade(self, user_deal):
-        grade = user_deal.deal.grade
-
-        if grade in [Deal.Grade.A_PLUS.value, Deal.Grade.A.value, Deal.Grade.A_MINUS.value]:
-            index = 0
-
-        elif grade in [Deal.Grade.B_PLUS.value, Deal.Grade.B.value, Deal.Grade.B_MINUS.value]:
-            index = 1
-
-        elif grade in [Deal.Grade.C_PLUS.value, Deal.Grade.C.value, Deal.Grade.C_MINUS.value]:
-            index = 2
-
-        elif grade in [Deal.Grade.D_PLUS.value, Deal.Grade.D.value, Deal.Grade.D_MINUS.value]:
-            index = 3
-
-        else:
-            index = 4
-
-        self.grade['amounts'][index] += user_deal.amount
-        self.grade['counts'][index]  += 1
-
-
-    def _set_by_earning_rate(self, user_deal):
-        earning_rate = user_deal.deal.earning_rate
-
-        if earning_rate < 8:
-            index = 0
-
-        elif earning_rate < 10:
-            index = 1
-
-        elif earning_rate < 12:
-            index = 2
-
-        else:
-            index = 3
-        
-        self.earning_rate['amounts'][index] += user_deal.amount
-        self.earning_rate['counts'][index]  += 1
-
-
-    def _set_by_categry(self, user_deal):
-        category = user_deal.deal.category
-
-        if category == Deal.Category.CREDIT.value:
-            index = 0
-
-        elif category == Deal.Category.COMPANY.value:
-            index = 1
-
-        elif category == Deal.Category.SPECIAL.value:
-            index = 2
-
-        elif category == Deal.Category.MORTGAGE.value:
-            index = 3
-
-        else:
-            index = 4
-
-        self.category['amounts'][index] += user_deal.amount
-        self.category['counts'][index]  += 1
+    def aggregate(self, user_deals):
+        rows = user_deals.filter(deal__isnull=False).annotate(
+            grade_bucket        = bucket_case('deal__grade__in', GRADE_BUCKETS),
+            earning_rate_bucket = bucket_case('deal__earning_rate__lt', EARNING_RATE_BUCKETS),
+            category_bucket     = bucket_case('deal__category__in', CATEGORY_BUCKETS)
+        ).order_by().values('grade_bucket', 'earning_rate_bucket', 'category_bucket').annotate(
+            total_amount = Sum('amount'),
+            total_count  = Count('id')
+        )
+
+        for row in rows:
+            for breakdown, index in [
+                (self.grade, row['grade_bucket']),
+                (self.earning_rate, row['earning_rate_bucket']),
+                (self.category, row['category_bucket'])
+            ]:
+                breakdown['amounts'][index] += row['total_amount']
+                breakdown['counts'][index]  += row['total_count']
+
+        return self
@@ -1,18 +1,22 @@
-import xlwt
 import urllib
 import json
 
 from django.views     import View
-from django.http      import JsonResponse, HttpResponse
+from django.http      import JsonResponse, StreamingHttpResponse, FileResponse
 from django.utils     import timezone
-from django.db.models import Sum, Q, Prefetch
-from django.db        import transaction, IntegrityError
-
-from users.utils        import user_validator
-from investments.utils  import Portfolio
-from investments.models import PaybackSchedule, UserDeal, UserPayback
-from deals.models       import Deal
-from users.models       import User
+from django.db.models import Q, Count
+from django.db        import IntegrityError
+
+from users.utils             import user_validator
+from investments.utils       import Portfolio
+from investments.paybacks    import resolve_paybacks, paid_totals
+from investments.statistics  import get_user_statistics
+from investments.exports     import EXPORT_COLUMNS, EXPORT_FORMATS, export_rows
+from investments.export_jobs import ExportError, submit_export
+from investments.orders      import OrderError, validate_order, create_investments, submit_order
+from investments.models      import PaybackSchedule, UserDeal, PendingOrder, ExportJob
+from deals.models            import Deal
+from users.models            import User
 
 class InvestmentHistoryView(View):
     @user_validator
@@ -27,10 +31,10 @@ class InvestmentHistoryView(View):
             user_deals  = UserDeal.objects.filter(user=signed_user).select_related('deal')
             q           = Q()
 
-            count_by_status = {"all": len(user_deals)}
-
-            for deal_status in Deal.Status.__members__:
-                count_by_status[Deal.Status[deal_status]] = len(user_deals.filter(deal__status=Deal.Status[deal_status]))
+            count_by_status = user_deals.aggregate(
+                all = Count('id'),
+                **{str(deal_status): Count('id', filter=Q(deal__status=deal_status)) for deal_status in Deal.Status.values}
+            )
 
             if status:
                 q &= Q(deal__status=status)
@@ -38,17 +42,14 @@ class InvestmentHistoryView(View):
             if search:
                 q &= Q(deal__name__contains=search) | Q(deal__id__contains=search)
 
-            investments  = user_deals.filter(q).prefetch_related(
-                Prefetch('userpayback_set', to_attr='paybacks'),
-                Prefetch('userpayback_set', queryset=UserPayback.objects.filter(state=UserPayback.State.PAID.value), to_attr='paid_paybacks')
-                )
+            investments = user_deals.filter(q)
+            totals      = paid_totals(investments)
+            page        = resolve_paybacks(investments.order_by('-created_at')[offset:limit])
 
             summary = {
-                "total"       : sum(investment.amount for investment in investments),
-                "paidTotal"   : investments.filter(userpayback__state=UserPayback.State.PAID.value)\
-                                .aggregate(paid_total=Sum('userpayback__principal'))['paid_total'],
-                "paidInterest": investments.filter(userpayback__state=UserPayback.State.PAID.value)\
-                                .aggregate(paid_interest=Sum('userpayback__interest'))['paid_interest']
+                "total"       : totals['amount'],
+                "paidTotal"   : totals['principal'],
+                "paidInterest": totals['interest']
             }
 
             items = [
@@ -67,7 +68,7 @@ class InvestmentHistoryView(View):
                     "repayment"   : int((sum(paid_payback.principal for paid_payback in investment.paid_paybacks) / investment.amount) * 100),
                     "cycle"       : len(investment.paid_paybacks),
                     "isCancelable": investment.created_at + timezone.timedelta(days=1) < timezone.now(),
-                } for investment in investments.order_by('-created_at')[offset:limit]
+                } for investment in page
             ]
             return JsonResponse({"summary":summary,"count": count_by_status, "items":items}, status=200)
 
@@ -79,12 +80,7 @@ class InvestmentPortfolioView(View):
     def get(self, request):
         user = request.user
 
-        user_deals = list(user.userdeal_set.all().prefetch_related('deal'))
-
-        portfolio = Portfolio()
-
-        for user_deal in user_deals:
-            portfolio.sort_deal(user_deal)
+        portfolio = Portfolio().aggregate(user.userdeal_set.all())
 
         results = {
             'grade'       : portfolio.grade,
@@ -99,32 +95,17 @@ class InvestmentSummaryView(View):
     def get(self, request):
         user = request.user
         
-        user_deals_by_status = {}
-        for deal_status in Deal.Status.__members__:
-            user_deals_by_status[deal_status] = user.userdeal_set.filter(
-                Q(deal__status = Deal.Status[deal_status])
-            ).prefetch_related(
-                Prefetch(
-                    'userpayback_set',
-                    queryset = UserPayback.objects.all(),
-                    to_attr  = 'all_paybacks'
-                ),
-                Prefetch(
-                    'userpayback_set',
-                    queryset = UserPayback.objects.filter(state=UserPayback.State.PAID.value),
-                    to_attr  = 'paid_paybacks'
-                ),
-            )
+        statistics = get_user_statistics(user)
 
         user_deals_by_status_sums = {}
-        for key, filtered_user_deals in user_deals_by_status.items():
+        for key, row in statistics.items():
             user_deals_by_status_sums[key] = {
-                'total_amount'     : int(filtered_user_deals.aggregate(Sum('amount'))['amount__sum'] or 0),
-                'total_interest'   : sum(sum(payback.interest for payback in user_deal.all_paybacks) for user_deal in filtered_user_deals),
-                'total_commission' : sum(sum(payback.commission for payback in user_deal.all_paybacks) for user_deal in filtered_user_deals),
-                'paid_principal'   : sum(sum(payback.principal for payback in user_deal.paid_paybacks) for user_deal in filtered_user_deals),
-                'paid_interest'    : sum(sum(payback.interest for payback in user_deal.paid_paybacks) for user_deal in filtered_user_deals),
-                'paid_commission'  : sum(sum(payback.commission for payback in user_deal.paid_paybacks) for user_deal in filtered_user_deals)
+                'total_amount'     : row.total_amount,
+                'total_interest'   : row.total_interest,
+                'total_commission' : row.total_commission,
+                'paid_principal'   : row.paid_principal,
+                'paid_interest'    : row.paid_interest,
+                'paid_commission'  : row.paid_commission
             }
 
         applying_invest_amount   = user_deals_by_status_sums['APPLYING']['total_amount'] - \
@@ -151,13 +132,7 @@ class InvestmentSummaryView(View):
         total_revenue = sum(value['total_interest'] for value in user_deals_by_status_sums.values()) - \
                         sum(value['total_commission'] for value in user_deals_by_status_sums.values())
         
-        mortgage_deals = user.userdeal_set.filter(
-            Q(deal__category=Deal.Category.MORTGAGE.value)
-        ).prefetch_related(
-            Prefetch('userpayback_set', queryset=UserPayback.objects.filter(~Q(state=UserPayback.State.PAID.value)), to_attr='left_paybacks')
-        )
-        
-        invest_mortgage_amount = sum(sum(payback.principal for payback in mortgage_deal.left_paybacks) for mortgage_deal in mortgage_deals)
+        invest_mortgage_amount = sum(row.mortgage_outstanding for row in statistics.values())
 
         deposit = {
             'bank'    : user.deposit_bank.name,
@@ -200,64 +175,19 @@ class InvestmentSummaryView(View):
 class XlsxExportView(View):
     @user_validator
     def get(self, request):
-        filename                        = urllib.parse.quote(
-            f'[{timezone.localdate().strftime("%Y-%m-%d")}] 투자 내역 다운로드.xlsx'.encode('utf-8')
+        export_format = request.GET.get('format', 'xlsx')
+
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({"message": "INVALID_FORMAT"}, status=400)
+
+        content_type, stream = EXPORT_FORMATS[export_format]
+        filename             = urllib.parse.quote(
+            f'[{timezone.localdate().strftime("%Y-%m-%d")}] 투자 내역 다운로드.{export_format}'.encode('utf-8')
+            )
+        response             = StreamingHttpResponse(
+            stream(EXPORT_COLUMNS, export_rows(request.user)), content_type=content_type
             )
-        response                        = HttpResponse(content_type="application/vnd.ms-excel")
         response["Content-Disposition"] = 'attachment;filename*=UTF-8\'\'%s' % filename
-        wb                              = xlwt.Workbook(encoding='ansi')
-        ws                              = wb.add_sheet('투자내역')
-        signed_user                     = request.user
-
-        row_number = 0
-        column_names = [
-            '투자일',
-            '상품호수', 
-            '상품명', 
-            '등급', 
-            '예상수익률(%)', 
-            '투자기간(개월)', 
-            '투자금액', 
-            '지급받은 원금', 
-            '지급받은 이자',
-            '세금', 
-            '커미션'
-            ]
-
-        for index, column_name in enumerate(column_names):
-            ws.write(row_number, index, column_name)
-
-
-        investments = UserDeal.objects.filter(user=signed_user).select_related('deal').prefetch_related(
-                    Prefetch('userpayback_set', to_attr='paybacks'),
-                    Prefetch(
-                        'userpayback_set', 
-                        queryset=UserPayback.objects.filter(state=UserPayback.State.PAID.value), 
-                        to_attr='paid_paybacks')
-                    )
-
-        rows = [
-            [
-                timezone.localtime(investment.created_at).strftime("%Y-%m-%d"),
-                investment.id,
-                investment.deal.name,
-                Deal.Grade(investment.deal.grade).label,
-                investment.deal.earning_rate,
-                investment.deal.repayment_period,
-                investment.amount,
-                sum(paid_payback.principal for paid_payback in investment.paid_paybacks),
-                sum(paid_payback.interest for paid_payback in investment.paid_paybacks),
-                sum(paid_payback.tax for paid_payback in investment.paid_paybacks),
-                sum(paid_payback.commission for paid_payback in investment.paid_paybacks)
-            ] for investment in investments
-        ]
-
-        for row in rows:
-            row_number +=1
-            for column_number, attribute in enumerate(row):
-                ws.write(row_number, column_number, attribute)
-
-        wb.save(response)
 
         return response
 
@@ -268,52 +198,20 @@ class InvestmentDealView(View):
             user = request.user
             data = json.loads(request.body)
 
-            user_deals = []
-            for deal_data in data['investments']:
-                deal             = Deal.objects.get(id=deal_data['id'], status=Deal.Status.APPLYING.value)
-                amount           = deal_data['amount']
-                payback_schedule = PaybackSchedule.objects.filter(deal=deal, option=amount)
-
-                if not payback_schedule:
-                    return JsonResponse({"message": "INVALID_OPTION"}, status=400) 
-
-                user_deal = {
-                    'deal'            : deal,
-                    'amount'          : amount,
-                    'payback_schedule': payback_schedule
-                }
-                user_deals.append(user_deal)
-
-            with transaction.atomic():
-                for user_deal in user_deals:
-
-                    userdeal = UserDeal.objects.create(
-                        deal   = user_deal['deal'],
-                        user   = user,
-                        amount = user_deal['amount']
-                    )
-
-                    UserPayback.objects.bulk_create([
-                        UserPayback(
-                            users_deals   = userdeal,
-                            principal     = payback.principal,
-                            interest      = payback.interest,
-                            tax           = payback.tax,
-                            commission    = payback.commission,
-                            payback_round = payback.payback_round,
-                            state         = UserPayback.State.TOBE_PAID.value,
-                            payback_date  = payback.payback_date
-                        ) for payback in user_deal['payback_schedule']
-                    ])
+            if request.GET.get('async') == 'true':
+                order = submit_order(user, data['investments'])
+
+                return JsonResponse({"message": "ACCEPTED", "orderId": order.id}, status=202)
 
+            create_investments(user, validate_order(user, data['investments']))
 
             return JsonResponse({"message": "SUCCESS"}, status=201)
 
         except KeyError:
             return JsonResponse({"message": "KEY_ERROR"}, status=400)
 
-        except Deal.DoesNotExist:
-            return JsonResponse({"message": "INVALID_DEAL"}, status=400)
+        except OrderError as error:
+            return JsonResponse({"message": error.message}, status=400)
         
         except IntegrityError:
             return JsonResponse({"message": "INVESTD_DEAL"}, status=400)
@@ -332,7 +230,7 @@ class InvestmentDealView(View):
                     "grade"           : Deal.Grade(deal.grade).label,
                     "earningRate"     : deal.earning_rate,
                     "repaymentPeriod" : deal.repayment_period,
-                    "amount"          : deal.userdeal_set.aggregate(total_price=Sum('amount'))['total_price'] or 0,
+                    "amount"          : deal.funded_amount,
                     "investmentOption": [option.value for option in PaybackSchedule.Option]
             } for deal in deals]
 
@@ -347,3 +245,80 @@ class InvestmentDealView(View):
             return JsonResponse({"results" : results}, status=200)
         except Deal.DoesNotExist:                                   
             return JsonResponse({"message":"INVALID_ERROR"}, status=400)
+
+class InvestmentOrderView(View):
+    @user_validator
+    def get(self, request, order_id):
+        try:
+            order = PendingOrder.objects.get(id=order_id, user=request.user)
+
+            results = {
+                'orderId': order.id,
+                'state'  : PendingOrder.State(order.state).name,
+                'message': order.message
+            }
+
+            return JsonResponse({"results": results}, status=200)
+
+        except PendingOrder.DoesNotExist:
+            return JsonResponse({"message": "INVALID_ORDER"}, status=400)
+
+class ExportJobView(View):
+    @user_validator
+    def post(self, request):
+        try:
+            data        = json.loads(request.body)
+            job, queued = submit_export(request.user, data['format'], bool(data.get('delta', False)))
+
+            results = {
+                'exportId': job.id,
+                'state'   : ExportJob.State(job.state).name
+            }
+
+            return JsonResponse({"message": "ACCEPTED" if queued else "SUCCESS", "results": results}, status=202 if queued else 200)
+
+        except KeyError:
+            return JsonResponse({"message": "KEY_ERROR"}, status=400)
+
+        except ExportError as error:
+            return JsonResponse({"message": error.message}, status=400)
+
+class ExportJobDetailView(View):
+    @user_validator
+    def get(self, request, export_id):
+        try:
+            job = ExportJob.objects.get(id=export_id, user=request.user)
+
+            results = {
+                'exportId': job.id,
+                'format'  : job.format,
+                'delta'   : job.since is not None,
+                'state'   : ExportJob.State(job.state).name,
+                'isStale' : job.is_stale,
+                'rowCount': job.row_count,
+                'message' : job.message
+            }
+
+            return JsonResponse({"results": results}, status=200)
+
+        except ExportJob.DoesNotExist:
+            return JsonResponse({"message": "INVALID_EXPORT"}, status=400)
+
+class ExportJobFileView(View):
+    @user_validator
+    def get(self, request, export_id):
+        try:
+            job = ExportJob.objects.get(id=export_id, user=request.user, state=ExportJob.State.COMPLETED.value)
+
+            filename = f'[{timezone.localtime(job.created_at).strftime("%Y-%m-%d")}] 투자 내역 다운로드.{job.format}'
+
+            return FileResponse(
+                open(job.file_path, 'rb'),
+                as_attachment = True,
+                filename      = filename,
+                content_type  = EXPORT_FORMATS[job.format][0]
+            )
+
+        except (ExportJob.DoesNotExist, TypeError, FileNotFoundError):
+            return JsonResponse({"message": "EXPORT_NOT_READY"}, status=400)
+
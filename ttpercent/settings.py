@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from my_settings import SECRET_KEY, DATABASES, LOGGING
+from my_settings import SECRET_KEY, DATABASES, LOGGING, CACHES
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -68,6 +68,12 @@ WSGI_APPLICATION = 'ttpercent.wsgi.application'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 DATABASES = DATABASES
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Must be shared by every gunicorn worker and management command (memcached, redis):
+# invested-deal sets and listing versions are invalidated from whichever process commits.
+CACHES = CACHES
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -103,6 +109,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 STATIC_URL = '/static/'
 
+# Rendered investment history exports
+EXPORT_ROOT = BASE_DIR / 'exports'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
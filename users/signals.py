@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch          import receiver
+
+from deals.utils  import add_platform_statistics
+from users.models import User
+
+@receiver(post_save, sender=User)
+def add_user_count(sender, instance, created, **kwargs):
+    if created:
+        add_platform_statistics(user_count=1)
+
+@receiver(post_delete, sender=User)
+def remove_user_count(sender, instance, **kwargs):
+    add_platform_statistics(user_count=-1)